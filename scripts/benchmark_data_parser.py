@@ -0,0 +1,73 @@
+"""
+Compara el parser vectorizado de `data_fetcher.extract_data_points` con el
+parser original basado en tuplas sobre respuestas sintéticas de varios MB.
+
+Uso:
+    python benchmark_data_parser.py --signals 8 --points 200000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from data_fetcher import extract_data_points
+from fake_tjii_cgi import format_data_block, synthetic_signal
+
+def legacy_extract_data_points(html_content, signals):
+    """Parser original: una tupla de Python por muestra."""
+    data_points_dict = {}
+    matches = list(re.finditer(r"var data(\d{2}) = \[(.*?)\];", html_content, re.DOTALL))
+    for signal_name in signals:
+        match = next((m for m in matches if f"var data{signals.index(signal_name)+1:02}" in m.group(0)), None)
+        if match:
+            data_block = match.group(2)
+            data_points = [tuple(map(float, line.strip('[]').split(','))) for line in data_block.split('],[')]
+            data_points_dict[signal_name] = data_points
+    return data_points_dict
+
+def build_response(n_signals, n_points):
+    signals = [f"SIG{i:02}" for i in range(1, n_signals + 1)]
+    blocks = []
+    for i, signal in enumerate(signals, start=1):
+        x, y = synthetic_signal(1, signal, 1.0, 0, n_points, 1)
+        blocks.append(format_data_block(i, x, y))
+    return "<script>\n" + "\n".join(blocks) + "\n</script>", signals
+
+def measure(parser, html_content, signals, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(html_content, signals)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parser(html_content, signals)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the TJII data-block parsers")
+    parser.add_argument("--signals", type=int, default=8)
+    parser.add_argument("--points", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    html_content, signals = build_response(args.signals, args.points)
+    print(f"Response: {len(html_content) / 1e6:.1f} MB, {args.signals} signals x {args.points} points")
+
+    legacy = legacy_extract_data_points(html_content, signals)
+    vectorized = extract_data_points(html_content, signals)
+    for signal in signals:
+        x, y = vectorized[signal]
+        assert np.array_equal(np.column_stack((x, y)), np.array(legacy[signal]))
+
+    for name, function in [("legacy", legacy_extract_data_points), ("vectorized", extract_data_points)]:
+        elapsed, peak = measure(function, html_content, signals, args.repeat)
+        print(f"{name:>10}: {elapsed * 1000:9.1f} ms   peak memory {peak / 1e6:8.1f} MB")
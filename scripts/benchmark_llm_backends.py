@@ -0,0 +1,86 @@
+"""
+Latencia de un backend de `llm_backends` con prompts independientes.
+
+Para cada número de prompts mide el tiempo de responderlos uno detrás de
+otro con `generate` y todos a la vez con `generate_many`, y el tiempo hasta
+el primer fragmento con `generate_stream`. Por defecto usa el backend `stub`
+(sin red, latencia fija y respuestas deterministas); con `--backend ollama
+--stub-server` se mide el cliente de Ollama contra el stub HTTP de
+`load_test_pipeline`.
+
+Uso:
+    python benchmark_llm_backends.py --prompts 2 4 8 --latency 0.5 --concurrency 2 4
+    python benchmark_llm_backends.py --backend ollama --stub-server --latency 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.append(SRC_DIR)
+
+def make_backend(name, concurrency, latency, token_delay):
+    from llm_backends import OllamaBackend, StubBackend, WatsonxBackend
+
+    if name == "stub":
+        return StubBackend(latency=latency, token_delay=token_delay, concurrency=concurrency)
+    if name == "ollama":
+        return OllamaBackend(concurrency=concurrency)
+    return WatsonxBackend(concurrency=concurrency)
+
+def benchmark(backend, n_prompts, run):
+    prompts = [f"Benchmark question {run}-{i}: what is a magnetic island?" for i in range(n_prompts)]
+
+    start = time.perf_counter()
+    sequential = [backend.generate(prompt) for prompt in prompts]
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = backend.generate_many(prompts)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stream = backend.generate_stream(prompts[0])
+    next(stream)
+    first_chunk = time.perf_counter() - start
+    for _ in stream:
+        pass
+
+    return {
+        "sequential": sequential_time,
+        "batch": batch_time,
+        "first_chunk": first_chunk,
+        "same": sequential == batched,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of an LLM backend: sequential calls vs generate_many")
+    parser.add_argument("--backend", choices=["stub", "ollama", "watsonx"], default="stub")
+    parser.add_argument("--prompts", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub latency before the first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--stub-server", action="store_true",
+                        help="Start the stub Ollama HTTP server of load_test_pipeline and point OLLAMA_HOST to it")
+    args = parser.parse_args()
+
+    server = None
+    if args.stub_server:
+        from load_test_pipeline import start_stub_ollama
+
+        server, os.environ["OLLAMA_HOST"] = start_stub_ollama(args.latency, args.token_delay)
+
+    print(f"{'backend':<8} {'workers':>7} {'prompts':>7} {'sequential':>11} {'batch':>9} "
+          f"{'speed-up':>8} {'1st chunk':>10} {'same':>5}")
+    for concurrency in args.concurrency:
+        backend = make_backend(args.backend, concurrency, args.latency, args.token_delay)
+        for run, n_prompts in enumerate(args.prompts):
+            result = benchmark(backend, n_prompts, run)
+            print(f"{args.backend:<8} {concurrency:>7} {n_prompts:>7} {result['sequential']:>10.2f}s "
+                  f"{result['batch']:>8.2f}s {result['sequential'] / result['batch']:>7.1f}x "
+                  f"{result['first_chunk']:>9.2f}s {str(result['same']):>5}")
+        backend.close()
+
+    if server is not None:
+        server.shutdown()
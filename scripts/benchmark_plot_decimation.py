@@ -0,0 +1,55 @@
+"""
+Mide el tiempo de render y el pico de memoria de `plotter.plot_data_per_signal`
+con y sin decimación min/max sobre señales sintéticas de 10^6 a 10^7 muestras.
+
+Uso:
+    python benchmark_plot_decimation.py --sizes 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from decimation import PLOT_MAX_POINTS
+from plotter import plot_data_per_signal
+
+def synthetic_signals(n_points, n_signals=2):
+    """Señales con ruido y ráfagas cortas que la decimación debe conservar."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 2000, n_points)
+    signals = {}
+    for i in range(1, n_signals + 1):
+        y = np.sin(2 * np.pi * x / (50 * i)) + 0.05 * rng.standard_normal(n_points)
+        bursts = rng.integers(0, n_points, 20)
+        y[bursts] += 5 * i
+        signals[f"ECE{i}"] = (x, y)
+    return signals
+
+def measure(data_points_dict, max_points):
+    tracemalloc.start()
+    start = time.perf_counter()
+    images = plot_data_per_signal(data_points_dict, max_points=max_points)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(images)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of plot decimation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 6, 10 ** 7])
+    parser.add_argument("--max-points", type=int, default=PLOT_MAX_POINTS)
+    args = parser.parse_args()
+
+    for n_points in args.sizes:
+        data_points_dict = synthetic_signals(n_points)
+        print(f"{n_points:>10} samples per signal, {len(data_points_dict)} signals")
+        for label, max_points in [("full", None), ("decimated", args.max_points)]:
+            elapsed, peak, n_images = measure(data_points_dict, max_points)
+            print(f"    {label:>9}: {elapsed:7.2f} s   peak memory {peak / 1e6:8.1f} MB   ({n_images} images)")
@@ -0,0 +1,113 @@
+"""
+Compara la latencia por consulta de pandasql (el motor anterior de
+`execute_sql_query`) con la base de datos SQLite persistente de
+`logbook_db`, con y sin los agregados materializados de
+`logbook_aggregates`, sobre un cuaderno de descargas sintético y consultas
+típicas de las que genera `query_csv`. También mide cuánto tarda la
+siguiente consulta tras añadir filas al CSV (inserción de las filas nuevas
+en SQLite y actualización incremental de los agregados) frente a
+reconstruirlo todo.
+
+Uso:
+    python benchmark_sql_engine.py --rows 60000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from logbook_aggregates import LogbookAggregates
+from logbook_db import LogbookDatabase, build_database, load_logbook_dataframe
+
+QUERIES = [
+    "SELECT COUNT(*) FROM data WHERE substr(fecha, 1, 4) = '2024'",
+    "SELECT COUNT(*) FROM data WHERE substr(fecha, 1, 7) = '2023/05'",
+    "SELECT * FROM data WHERE n_descarga = 57546",
+    "SELECT fecha FROM data WHERE n_descarga = (SELECT MAX(n_descarga) FROM data)",
+    "SELECT MAX(CAST(ip_max AS INTEGER)) FROM data",
+    "SELECT COUNT(*) FROM data WHERE configuracion = '100_44_64'",
+    "SELECT n_descarga, hora FROM data WHERE fecha = '2024/03/12'",
+    "SELECT MAX(fecha) FROM data",
+    "SELECT substr(fecha, 1, 7), COUNT(*) FROM data GROUP BY substr(fecha, 1, 7)",
+]
+
+def synthetic_logbook(path, n_rows):
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 3650, n_rows)), unit="D")
+    df = pd.DataFrame({
+        "N_DESCARGA": np.arange(57546 - n_rows // 2, 57546 - n_rows // 2 + n_rows),
+        "FECHA": dates.strftime("%Y/%m/%d"),
+        "HORA": [f"{h:02}:{m:02}" for h, m in zip(rng.integers(8, 20, n_rows), rng.integers(0, 60, n_rows))],
+        "CONFIGURACION": rng.choice(["100_44_64", "100_40_63", "101_42_64"], n_rows),
+        "VALIDADA": rng.choice(["S", "N"], n_rows),
+        "IP_MAX": rng.uniform(0, 400, n_rows).round(2),
+        "NE_MEDIA": rng.uniform(0.1, 5, n_rows).round(3),
+    })
+    df.to_csv(path, index=False)
+
+def time_queries(run_query, repeat):
+    latencies = []
+    for sql_query in QUERIES:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_query(sql_query)
+            times.append(time.perf_counter() - start)
+        latencies.append(min(times))
+    return latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of pandasql vs the persistent SQLite logbook")
+    parser.add_argument("--rows", type=int, default=60000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, "logbook.csv")
+        synthetic_logbook(csv_file, args.rows)
+
+        logbook = LogbookDatabase(csv_file, os.path.join(tmp_dir, "logbook.sqlite"), aggregates=False)
+        start = time.perf_counter()
+        logbook.columns()
+        print(f"SQLite database built in {time.perf_counter() - start:.2f} s ({args.rows} rows)")
+        results = {"sqlite": time_queries(logbook.query, args.repeat)}
+
+        aggregated = LogbookDatabase(csv_file, os.path.join(tmp_dir, "logbook.sqlite"))
+        start = time.perf_counter()
+        aggregated.columns()
+        print(f"Aggregates built in {time.perf_counter() - start:.2f} s")
+        results["aggregates"] = time_queries(aggregated.query, args.repeat)
+
+        appended = load_logbook_dataframe(csv_file).tail(max(1, args.rows // 100))
+        appended.to_csv(csv_file, mode="a", header=False, index=False)
+        start = time.perf_counter()
+        aggregated.query(QUERIES[0])
+        print(f"First query after appending {len(appended)} rows: {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"({aggregated.appended_rows} rows inserted, {aggregated.rebuilds} rebuilds, "
+              f"{aggregated.aggregates.stats()['incremental_refreshes']} incremental aggregate refreshes)")
+        aggregated.close()
+
+        start = time.perf_counter()
+        build_database(csv_file, os.path.join(tmp_dir, "rebuilt.sqlite"))
+        LogbookAggregates(csv_file).refresh()
+        print(f"Full rebuild of the database and the aggregates: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        try:
+            import pandasql as ps
+        except ImportError:
+            print("pandasql is not installed; only the SQLite engine was measured.")
+        else:
+            # Mismo DataFrame que usaba ai_parser: todas las columnas como texto
+            data = load_logbook_dataframe(csv_file).astype(str)
+            results["pandasql"] = time_queries(lambda sql_query: ps.sqldf(sql_query, {"data": data}), args.repeat)
+        logbook.close()
+
+    print(f"{'query':<80} " + " ".join(f"{name:>10}" for name in results))
+    for i, sql_query in enumerate(QUERIES):
+        print(f"{sql_query[:80]:<80} " + " ".join(f"{latencies[i] * 1000:8.1f}ms" for latencies in results.values()))
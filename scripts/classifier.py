@@ -1,18 +1,38 @@
 import os
+import sys
+import argparse
 import pandas as pd
 import cv2
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.svm import SVC
+from sklearn.svm import SVC, LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.decomposition import IncrementalPCA
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.random_projection import SparseRandomProjection
 from skimage.feature import hog
 import joblib
 from sklearn.metrics import classification_report, accuracy_score
 
-# Ruta a las imágenes de los espectrogramas
-IMAGES_FOLDER = "../data/spectograms/spectograms_for_ai_learning"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from plot_spectogram import load_spectrogram_arrays
+from predict_spectogram import images_from_spectrogram
+# Rutas a las imágenes y al almacén numérico (.npz por shot) de los espectrogramas
+from feature_store import FeatureStore, HOG_PARAMS, IMAGES_FOLDER, ARRAYS_FOLDER, CHUNK_SIZE
 
 # Ruta al archivo Excel con etiquetas
 EXCEL_PATH = "../data/processed/clasified_spectrograms.xlsx"
+MODEL_PATH = "mhd_detector_model.pkl"
+
+# Reducción de dimensión opcional antes del clasificador lineal
+REDUCTIONS = ["none", "pca", "random"]
+CLASSIFIERS = ["svc", "linearsvc", "sgd"]
+N_COMPONENTS = 256
+
+# Entrenamiento incremental: pasadas sobre los shots nuevos y shots reservados para test
+INCREMENTAL_EPOCHS = 5
+TEST_EVERY = 5
 
 # Función para cargar etiquetas desde Excel
 def load_labels_from_excel(excel_path):
@@ -41,6 +61,14 @@ def load_images_for_shot(shot_number):
     
     return images
 
+# Construir las tres imágenes directamente desde la matriz en dB guardada
+def load_images_from_arrays(shot_number):
+    arrays = load_spectrogram_arrays(shot_number, ARRAYS_FOLDER)
+    if arrays is None:
+        print(f"Warning: spectrogram arrays for {shot_number} not found")
+        return None
+    return images_from_spectrogram(arrays[2])
+
 # Extraer características HOG de las imágenes concatenadas
 def extract_features_from_images(images):
     hog_features = []
@@ -50,53 +78,149 @@ def extract_features_from_images(images):
         hog_features.extend(features)  # Concatenar features de las 3 imágenes
     return np.array(hog_features)
 
-# Cargar y procesar el dataset completo
-def load_dataset(excel_path):
+# Cargar el dataset completo desde el almacén de características,
+# calculando sólo los shots nuevos o cuyas imágenes han cambiado
+def load_dataset(excel_path, source="png", workers=None):
     df = load_labels_from_excel(excel_path)
+    shots = df['Spectrogram Number'].astype(int).tolist()
+    labels = dict(zip(shots, df['MHD']))
 
-    all_features = []
-    all_labels = []
-
-    for _, row in df.iterrows():
-        shot_number = row['Spectrogram Number']
-        mhd_label = row['MHD']
-
-        images = load_images_for_shot(shot_number)
-        if images is not None:
-            features = extract_features_from_images(images)
-            all_features.append(features)
-            all_labels.append(mhd_label)
+    store = FeatureStore(dict(HOG_PARAMS, source=source))
+    computed = store.update(shots, workers)
+    print(f"Características calculadas para {computed} shots nuevos o modificados")
 
-    # Convertir a arrays de NumPy
-    X = np.array(all_features)
-    y = np.array(all_labels)
+    X, found_shots = store.load(shots)
+    y = np.array([labels[shot] for shot in found_shots])
 
     if len(X) == 0:
         raise ValueError("No se encontraron datos válidos para entrenar el modelo.")
 
     return X, y
 
+# Construir el modelo: SVC lineal sobre los 24300 HOG (el original) o una
+# Pipeline con reducción de dimensión (IncrementalPCA o proyección aleatoria
+# dispersa) y un clasificador lineal con probabilidades calibradas
+def build_model(reduction="none", classifier="svc", n_components=N_COMPONENTS, n_samples=None):
+    if reduction == "none" and classifier == "svc":
+        return SVC(kernel='linear', probability=True)
+
+    steps = []
+    if reduction == "pca":
+        # IncrementalPCA no admite más componentes que muestras
+        n_components = min(n_components, n_samples) if n_samples else n_components
+        steps.append(("reduce", IncrementalPCA(n_components=n_components, batch_size=max(n_components, 512))))
+    elif reduction == "random":
+        steps.append(("reduce", SparseRandomProjection(n_components=n_components, random_state=42)))
+
+    if classifier == "sgd":
+        # log_loss da probabilidades directamente, sin validación cruzada interna
+        steps.append(("classify", SGDClassifier(loss="log_loss", alpha=1e-4, max_iter=50, tol=1e-3,
+                                                 class_weight="balanced", random_state=42)))
+    elif classifier == "linearsvc":
+        steps.append(("classify", CalibratedClassifierCV(LinearSVC(C=1.0, class_weight="balanced"), cv=3)))
+    else:
+        steps.append(("classify", SVC(kernel='linear', probability=True)))
+    return Pipeline(steps)
+
 # Entrenar y evaluar el modelo
-def train_and_evaluate_model(X, y):
+def train_and_evaluate_model(X, y, source="png", reduction="none", classifier="svc",
+                             n_components=N_COMPONENTS, model_path=MODEL_PATH):
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    model = SVC(kernel='linear', probability=True)
+    model = build_model(reduction, classifier, n_components, len(X_train))
     model.fit(X_train, y_train)
+    # El predictor usa este atributo para calcular las características del mismo modo
+    model.feature_source_ = source
 
     y_pred = model.predict(X_test)
 
     print(classification_report(y_test, y_pred))
     print(f"Accuracy: {accuracy_score(y_test, y_pred):.2f}")
 
-    # Guardar el modelo entrenado
-    joblib.dump(model, "mhd_detector_model.pkl")
-    print("Modelo guardado como 'mhd_detector_model.pkl'")
+    # Guardar el modelo entrenado (un único artefacto, también si es una Pipeline)
+    joblib.dump(model, model_path)
+    print(f"Modelo guardado como '{model_path}'")
+
+    return model
+
+# Los shots de test se eligen por número, así nunca entran en el entrenamiento
+# aunque el modelo se vaya ampliando con shots nuevos
+def is_test_shot(shot_number):
+    return shot_number % TEST_EVERY == 0
 
+# Modelo guardado que se puede seguir entrenando con partial_fit, o None
+def load_incremental_model(model_path, source):
+    if not os.path.exists(model_path):
+        return None
+    model = joblib.load(model_path)
+    if (not hasattr(model, "partial_fit") or getattr(model, "trained_shots_", None) is None
+            or getattr(model, "feature_source_", "png") != source):
+        return None
+    return model
+
+# Entrenamiento por bloques desde el almacén de características: la memoria
+# depende de `chunk_size`, no del tamaño del dataset. Si ya existe un modelo
+# incremental sólo se entrena con los shots etiquetados nuevos, mezclando en
+# cada bloque otros tantos shots ya aprendidos para que no los olvide
+def train_incremental(excel_path, source="png", workers=None, chunk_size=CHUNK_SIZE,
+                      epochs=INCREMENTAL_EPOCHS, model_path=MODEL_PATH, rebuild=False):
+    df = load_labels_from_excel(excel_path).dropna(subset=['MHD'])
+    shots = df['Spectrogram Number'].astype(int).tolist()
+    labels = dict(zip(shots, df['MHD'].astype(int)))
+
+    store = FeatureStore(dict(HOG_PARAMS, source=source))
+    computed = store.update(shots, workers)
+    print(f"Características calculadas para {computed} shots nuevos o modificados")
+
+    model = None if rebuild else load_incremental_model(model_path, source)
+    if model is None:
+        model = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=42)
+        model.trained_shots_ = []
+    trained = set(model.trained_shots_)
+    new_shots = [shot for shot in shots if not is_test_shot(shot) and shot not in trained]
+    if not new_shots:
+        print("No hay shots etiquetados nuevos; el modelo no cambia")
+        return model
+    print(f"Entrenando con {len(new_shots)} shots nuevos ({len(trained)} ya aprendidos)")
+
+    rng = np.random.default_rng(42)
+    classes = np.array([0, 1])
+    fitted = set()
+    # Los shots que ya no están etiquetados en el Excel no se repasan (no se sabe su clase)
+    old_shots = sorted(shot for shot in trained if shot in labels)
+    for _ in range(epochs):
+        for X_chunk, chunk_shots in store.iter_chunks(rng.permutation(new_shots).tolist(), chunk_size):
+            y_chunk = [labels[shot] for shot in chunk_shots]
+            if old_shots:
+                replay = rng.choice(old_shots, min(len(old_shots), len(chunk_shots)), replace=False).tolist()
+                for X_old, old_found in store.iter_chunks(replay, len(replay)):
+                    X_chunk = np.vstack([X_chunk, X_old])
+                    y_chunk += [labels[shot] for shot in old_found]
+            model.partial_fit(X_chunk, y_chunk, classes=classes)
+            fitted.update(chunk_shots)
+
+    model.trained_shots_ = sorted(trained | fitted)
+    # El predictor usa este atributo para calcular las características del mismo modo
+    model.feature_source_ = source
+
+    y_true, y_pred = [], []
+    for X_chunk, chunk_shots in store.iter_chunks([shot for shot in shots if is_test_shot(shot)], chunk_size):
+        y_true += [labels[shot] for shot in chunk_shots]
+        y_pred += model.predict(X_chunk).tolist()
+    if y_true:
+        print(classification_report(y_true, y_pred))
+        print(f"Accuracy: {accuracy_score(y_true, y_pred):.2f}")
+
+    joblib.dump(model, model_path)
+    print(f"Modelo guardado como '{model_path}' ({len(model.trained_shots_)} shots aprendidos)")
     return model
 
 # Predecir MHD en un nuevo shot usando el modelo entrenado
 def predict_shot(model, shot_number):
-    images = load_images_for_shot(shot_number)
+    if getattr(model, "feature_source_", "png") == "array":
+        images = load_images_from_arrays(shot_number)
+    else:
+        images = load_images_for_shot(shot_number)
     if images is None:
         return None
 
@@ -106,13 +230,33 @@ def predict_shot(model, shot_number):
 
 # Ejecutar todo el proceso automáticamente
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrena el detector de MHD.")
+    parser.add_argument("--source", choices=["png", "array"], default="png",
+                        help="Calcular las características desde los PNG o desde los arrays de espectrograma")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para calcular características")
+    parser.add_argument("--reduction", choices=REDUCTIONS, default="none",
+                        help="Reducción de dimensión antes del clasificador")
+    parser.add_argument("--components", type=int, default=N_COMPONENTS, help="Dimensión tras la reducción")
+    parser.add_argument("--classifier", choices=CLASSIFIERS, default="svc",
+                        help="svc (SVC lineal con probability=True), linearsvc calibrado o sgd")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Entrenar por bloques con partial_fit, añadiendo sólo los shots etiquetados nuevos")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Shots por bloque en modo incremental")
+    parser.add_argument("--epochs", type=int, default=INCREMENTAL_EPOCHS, help="Pasadas sobre los shots nuevos")
+    parser.add_argument("--rebuild", action="store_true", help="En modo incremental, empezar un modelo desde cero")
+    args = parser.parse_args()
+
+    if args.incremental:
+        train_incremental(EXCEL_PATH, args.source, args.workers, args.chunk_size, args.epochs, rebuild=args.rebuild)
+        sys.exit(0)
+
     print("Cargando dataset y entrenando modelo...")
 
     try:
-        X, y = load_dataset(EXCEL_PATH)
+        X, y = load_dataset(EXCEL_PATH, args.source, args.workers)
         print(f"Dataset cargado con {len(X)} muestras")
 
-        model = train_and_evaluate_model(X, y)
+        model = train_and_evaluate_model(X, y, args.source, args.reduction, args.classifier, args.components)
 
         # Probar con un shot aleatorio del dataset
         test_shot = np.random.choice(y.shape[0])
@@ -0,0 +1,94 @@
+"""
+Servidor local que imita a TJII_data.cgi para pruebas y benchmarks sin red.
+
+Devuelve, para cada señal pedida, un bloque `var dataNN = [[x,y],...];` con
+una señal sintética determinista (depende sólo del shot y del nombre de la
+señal), en el mismo formato que la CGI real.
+
+Uso:
+    python fake_tjii_cgi.py --port 8765 --rate 10
+    # BASE_URL = "http://127.0.0.1:8765/cgi-bin/TJII_data.cgi"
+"""
+import argparse
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+CGI_PATH = "/cgi-bin/TJII_data.cgi"
+
+def synthetic_signal(shot, signal, factor, tstart, tstop, rate):
+    """Genera una señal sintética de `rate` muestras por ms en [tstart, tstop]."""
+    seed = zlib.crc32(f"{shot}|{signal}".encode("utf-8"))
+    rng = np.random.default_rng(seed)
+    x = np.arange(tstart, tstop, 1.0 / rate)
+    freq = 0.01 + (seed % 100) / 1000
+    y = factor * (np.sin(2 * np.pi * freq * x) + 0.1 * rng.standard_normal(len(x)))
+    return x, y
+
+def format_data_block(index, x, y):
+    points = ",".join(f"[{xi:.4f},{yi:.6f}]" for xi, yi in zip(x.tolist(), y.tolist()))
+    return f"var data{index:02} = [{points}];"
+
+
+class FakeCGIHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != CGI_PATH:
+            self.send_error(404)
+            return
+
+        self.server.request_count += 1
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            shot = int(params["shot"])
+            nsignal = int(params["nsignal"])
+            tstart = float(params.get("tstart", 0))
+            tstop = float(params.get("tstop", 2000))
+        except (KeyError, ValueError):
+            self.send_error(400)
+            return
+
+        blocks = []
+        for i in range(1, nsignal + 1):
+            signal = params.get(f"signal{i:02}", "")
+            factor = float(params.get(f"fact{i:02}", "1.00"))
+            if signal:
+                x, y = synthetic_signal(shot, signal, factor, tstart, tstop, self.server.rate)
+                blocks.append(format_data_block(i, x, y))
+
+        body = "<html><head><script>\n" + "\n".join(blocks) + "\n</script></head><body></body></html>"
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host="127.0.0.1", port=0, rate=1):
+    """Arranca el servidor en un hilo y devuelve (servidor, url base de la CGI)."""
+    server = ThreadingHTTPServer((host, port), FakeCGIHandler)
+    server.request_count = 0
+    server.rate = rate
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{CGI_PATH}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake TJII_data.cgi server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=1, help="Samples per ms")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.host, args.port, args.rate)
+    print(f"Serving fake TJII data at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,208 @@
+"""
+Almacén persistente de características HOG para entrenar el detector de MHD.
+
+Las características se guardan en `FEATURE_STORE_DIR/<hash de parámetros>/`:
+una matriz float32 `features.npy` (una fila por shot) que se abre con memory
+map, y un `index.json` con el orden de los shots y la huella (tamaño y fecha
+de modificación) de los ficheros de origen de cada uno. Al actualizar sólo
+se calculan los shots nuevos o cuyos ficheros han cambiado, en un pool de
+procesos, y `iter_chunks` permite recorrer la matriz por bloques para
+entrenar sin cargarla entera en memoria. Cambiar cualquier parámetro
+(tamaño de imagen, orientaciones, pixels_per_cell, origen...) usa otro
+directorio.
+"""
+import hashlib
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+from skimage.feature import hog
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from plot_spectogram import spectrogram_array_path, load_spectrogram_arrays
+from predict_spectogram import images_from_spectrogram
+
+FEATURE_STORE_DIR = "../data/features"
+IMAGES_FOLDER = "../data/spectograms/spectograms_for_ai_learning"
+ARRAYS_FOLDER = "../src/spectograms/arrays"
+
+HOG_PARAMS = {
+    "source": "png",
+    "image_size": [128, 128],
+    "orientations": 9,
+    "pixels_per_cell": [8, 8],
+    "cells_per_block": [2, 2],
+}
+
+PNG_SUFFIXES = ["", "_N", "_N_bw"]
+
+# Filas por bloque al entrenar por partes y al copiar la matriz
+CHUNK_SIZE = 512
+COPY_CHUNK_ROWS = 4096
+
+def params_hash(params):
+    """Hash estable de los parámetros de extracción de características."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def source_files(shot_number, params):
+    """Ficheros de los que salen las características de un shot."""
+    if params["source"] == "array":
+        return [spectrogram_array_path(shot_number, ARRAYS_FOLDER)]
+    return [os.path.join(IMAGES_FOLDER, f"{shot_number}{suffix}.png") for suffix in PNG_SUFFIXES]
+
+def fingerprint(shot_number, params):
+    """Tamaño y fecha de modificación de los ficheros de origen, o None si falta alguno."""
+    stamps = []
+    for path in source_files(shot_number, params):
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        stamps.append([stat.st_size, stat.st_mtime_ns])
+    return stamps
+
+def load_images(shot_number, params):
+    """Carga las tres imágenes en gris del shot con el tamaño indicado en `params`."""
+    size = tuple(params["image_size"])
+    if params["source"] == "array":
+        arrays = load_spectrogram_arrays(shot_number, ARRAYS_FOLDER)
+        return None if arrays is None else images_from_spectrogram(arrays[2], size)
+
+    images = []
+    for path in source_files(shot_number, params):
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return None
+        images.append(cv2.resize(img, size))
+    return images
+
+def compute_features(task):
+    """Calcula el vector HOG concatenado de un shot. Devuelve (shot, vector o None)."""
+    shot_number, params = task
+    images = load_images(shot_number, params)
+    if images is None:
+        return shot_number, None
+
+    features = [hog(img, orientations=params["orientations"],
+                    pixels_per_cell=tuple(params["pixels_per_cell"]),
+                    cells_per_block=tuple(params["cells_per_block"]), visualize=False)
+                for img in images]
+    return shot_number, np.concatenate(features).astype(np.float32)
+
+
+class FeatureStore:
+    """Matriz de características HOG persistente e incremental."""
+
+    def __init__(self, params=HOG_PARAMS, store_dir=FEATURE_STORE_DIR):
+        self.params = dict(params)
+        self.directory = os.path.join(store_dir, params_hash(self.params))
+        self.matrix_path = os.path.join(self.directory, "features.npy")
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if os.path.exists(self.index_path) and os.path.exists(self.matrix_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"params": self.params, "shots": [], "fingerprints": {}}
+
+    def matrix(self):
+        """Matriz float32 de características (memory map de solo lectura), o None si está vacía."""
+        if not self.index["shots"]:
+            return None
+        return np.load(self.matrix_path, mmap_mode="r")
+
+    def stale_shots(self, shot_numbers):
+        """Shots cuyo vector falta o cuyos ficheros de origen han cambiado."""
+        stale = []
+        for shot_number in map(int, shot_numbers):
+            current = fingerprint(shot_number, self.params)
+            if current is not None and self.index["fingerprints"].get(str(shot_number)) != current:
+                stale.append(shot_number)
+        return stale
+
+    def update(self, shot_numbers, workers=None):
+        """
+        Calcula en paralelo los shots nuevos o modificados y reescribe la matriz.
+        Los vectores se escriben según llegan en un memory map temporal, de modo
+        que la memoria no crece con el número de shots. Devuelve cuántos se calcularon.
+        """
+        stale = self.stale_shots(shot_numbers)
+        if not stale:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        new_path = f"{self.matrix_path}.{os.getpid()}.new.npy"
+        new_matrix = None
+        new_rows = {}
+
+        with Pool(processes=workers) as pool:
+            for shot, vector in pool.imap(compute_features, [(shot, self.params) for shot in stale], chunksize=8):
+                if vector is None:
+                    continue
+                if new_matrix is None:
+                    new_matrix = np.lib.format.open_memmap(new_path, mode="w+", dtype=np.float32,
+                                                           shape=(len(stale), len(vector)))
+                new_matrix[len(new_rows)] = vector
+                new_rows[shot] = len(new_rows)
+        if not new_rows:
+            return 0
+
+        old_matrix = self.matrix()
+        old_rows = {shot: i for i, shot in enumerate(self.index["shots"])}
+        kept = [shot for shot in self.index["shots"] if shot not in new_rows]
+        shots = kept + list(new_rows)
+
+        tmp_path = f"{self.matrix_path}.{os.getpid()}.tmp.npy"
+        matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                           shape=(len(shots), new_matrix.shape[1]))
+        for start in range(0, len(kept), COPY_CHUNK_ROWS):
+            rows = [old_rows[shot] for shot in kept[start:start + COPY_CHUNK_ROWS]]
+            matrix[start:start + len(rows)] = old_matrix[rows]
+        matrix[len(kept):] = new_matrix[:len(new_rows)]
+        matrix.flush()
+        del matrix, old_matrix, new_matrix
+        os.replace(tmp_path, self.matrix_path)
+        os.remove(new_path)
+
+        for shot in new_rows:
+            self.index["fingerprints"][str(shot)] = fingerprint(shot, self.params)
+        self.index["shots"] = shots
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+
+        return len(new_rows)
+
+    def iter_chunks(self, shot_numbers, chunk_size=CHUNK_SIZE):
+        """
+        Recorre los shots pedidos que están en el almacén en bloques de
+        `chunk_size` filas. Devuelve (X, shots) por bloque: sólo un bloque
+        está en memoria a la vez.
+        """
+        matrix = self.matrix()
+        if matrix is None:
+            return
+        rows = {shot: i for i, shot in enumerate(self.index["shots"])}
+        found = [shot for shot in map(int, shot_numbers) if shot in rows]
+        for start in range(0, len(found), chunk_size):
+            chunk = found[start:start + chunk_size]
+            yield np.asarray(matrix[[rows[shot] for shot in chunk]]), chunk
+
+    def load(self, shot_numbers):
+        """
+        Devuelve (X, shots) con las filas de los shots pedidos que están en el
+        almacén, en el orden pedido. Si coinciden con toda la matriz y en el
+        mismo orden, X es directamente el memory map.
+        """
+        matrix = self.matrix()
+        rows = {shot: i for i, shot in enumerate(self.index["shots"])}
+        found = [shot for shot in map(int, shot_numbers) if shot in rows]
+        if matrix is None or not found:
+            return np.empty((0, 0), dtype=np.float32), []
+
+        indices = [rows[shot] for shot in found]
+        if indices == list(range(len(matrix))):
+            return matrix, found
+        return matrix[indices], found
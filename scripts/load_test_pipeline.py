@@ -0,0 +1,161 @@
+"""
+Prueba de carga de `main.chatbot_response` con N usuarios simultáneos.
+
+Arranca dos servidores locales: la CGI falsa de `fake_tjii_cgi` y un stub de
+la API de Ollama (`/api/chat`, con y sin streaming) que responde tras un
+retardo configurable. Después lanza, para cada número de usuarios, N
+corrutinas que envían peticiones de gráficos y preguntas generales y mide
+el rendimiento (peticiones/s), la latencia hasta el primer resultado y la
+latencia total, además de las peticiones rechazadas o caducadas y la
+duración media de cada etapa (intención, extracción, descarga, gráfico...).
+
+Uso:
+    python load_test_pipeline.py --users 1 4 16 --requests 5 --llm-delay 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.append(SRC_DIR)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_tjii_cgi import start_server
+
+PLOT_QUERIES = [
+    "plot ECE7 and ECE8 for shot {shot} from 1000 to 1200 ms",
+    "grafica la señal BO101 y BO102 de la descarga {shot} entre 1050 y 1250",
+    "dibuja Densidad2_ del shot {shot}",
+]
+GENERAL_QUERIES = [
+    "Explica qué es un stellarator ({shot})",
+    "What is a magnetic island? ({shot})",
+]
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Imita `POST /api/chat` de Ollama con un retardo fijo y streaming opcional."""
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.server.llm_delay)
+
+        words = ["This", "is", "a", "stub", "answer", "from", "the", "load", "test."]
+        created_at = datetime.now(timezone.utc).isoformat()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if request.get("stream") else "application/json")
+        self.end_headers()
+
+        if not request.get("stream"):
+            message = {"role": "assistant", "content": " ".join(words)}
+            self.wfile.write(json.dumps({"model": request.get("model"), "created_at": created_at,
+                                         "message": message, "done": True}).encode("utf-8"))
+            return
+
+        for word in words:
+            chunk = {"model": request.get("model"), "created_at": created_at,
+                     "message": {"role": "assistant", "content": word + " "}, "done": False}
+            self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        done = {"model": request.get("model"), "created_at": created_at,
+                "message": {"role": "assistant", "content": ""}, "done": True}
+        self.wfile.write((json.dumps(done) + "\n").encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_ollama(llm_delay, token_delay, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, 0), StubOllamaHandler)
+    server.llm_delay = llm_delay
+    server.token_delay = token_delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+async def simulated_user(main, n_requests, general_ratio, rng, results):
+    for _ in range(n_requests):
+        shot = int(rng.integers(40000, 60000))
+        queries = GENERAL_QUERIES if rng.random() < general_ratio else PLOT_QUERIES
+        query = queries[int(rng.integers(len(queries)))].format(shot=shot)
+
+        start = time.perf_counter()
+        first = None
+        text = ""
+        async for text, *_ in main.chatbot_response(query):
+            if first is None:
+                first = time.perf_counter() - start
+        results.append((first, time.perf_counter() - start, str(text)))
+
+async def run_load(main, n_users, n_requests, general_ratio, seed):
+    from request_pipeline import RequestPipeline
+
+    main.pipeline = RequestPipeline()
+    results = []
+    rngs = [np.random.default_rng(seed + i) for i in range(n_users)]
+    start = time.perf_counter()
+    await asyncio.gather(*(simulated_user(main, n_requests, general_ratio, rngs[i], results)
+                           for i in range(n_users)))
+    elapsed = time.perf_counter() - start
+    stats = main.pipeline.stats()
+    main.pipeline.close()
+    return results, elapsed, stats
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the async chatbot pipeline against local stubs")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=5, help="Requests per simulated user")
+    parser.add_argument("--general-ratio", type=float, default=0.3, help="Fraction of LLM (GENERAL) questions")
+    parser.add_argument("--llm-delay", type=float, default=1.0, help="Stub LLM latency before the first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--rate", type=float, default=1, help="Fake CGI samples per ms")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cgi_server, base_url = start_server(rate=args.rate)
+    ollama_server, ollama_host = start_stub_ollama(args.llm_delay, args.token_delay)
+    os.environ["OLLAMA_HOST"] = ollama_host
+    os.environ["TJII_BASE_URL"] = base_url
+
+    # main.py usa rutas relativas a src/
+    os.chdir(SRC_DIR)
+    import ai_parser
+    import main
+    from fetch_engine import FetchEngine
+    from llm_cache import LLMCache
+    from signal_cache import SignalCache
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Sin cachés: cada petición llega de verdad al LLM y a la CGI
+        ai_parser.llm_cache = LLMCache(os.path.join(tmp_dir, "llm.sqlite"), ttl=0)
+        main.fetch_engine = FetchEngine(base_url, cache=SignalCache(os.path.join(tmp_dir, "signals")))
+
+        print(f"{'users':>5} {'requests':>8} {'req/s':>7} {'first p50':>10} {'first p95':>10} "
+              f"{'total p50':>10} {'total p95':>10} {'rejected':>8} {'timeouts':>8}")
+        for n_users in args.users:
+            results, elapsed, stats = asyncio.run(run_load(main, n_users, args.requests, args.general_ratio, args.seed))
+            first = [r[0] for r in results if r[0] is not None]
+            total = [r[1] for r in results]
+            print(f"{n_users:>5} {len(results):>8} {len(results) / elapsed:>7.2f} "
+                  f"{percentile(first, 50):>9.2f}s {percentile(first, 95):>9.2f}s "
+                  f"{percentile(total, 50):>9.2f}s {percentile(total, 95):>9.2f}s "
+                  f"{stats.get('rejected', 0):>8} {stats.get('timed_out', 0):>8}")
+            print("      mean stage times: " + ", ".join(f"{name} {elapsed:.2f}s"
+                                                    for name, elapsed in stats["stage_mean"].items()))
+
+    cgi_server.shutdown()
+    ollama_server.shutdown()
@@ -1,51 +1,59 @@
 import json
 import os
-import ollama
 from dotenv import load_dotenv
-from config_loader import load_signal_options
-import json
-from ibm_watson_machine_learning.foundation_models import Model
-import pandas as pd
-import pandasql as ps
+from config_loader import load_keywords
+from logbook_db import get_logbook
+from llm_backends import get_backend
+from llm_cache import LLMCache
+from intent_classifier import IntentClassifier, IntentStats
+from input_extractor import InputExtractor
+from response_templates import detect_language, render_sql_result
+from signal_registry import get_registry
 import re
+import time
 
 
 load_dotenv()
 
-valid_signals = set(load_signal_options())
+signal_registry = get_registry()
 
-LLM_MODEL = "llama3"
+# El SDK del backend (ollama por defecto) se importa en la primera llamada;
+# el límite de concurrencia y el plazo son los del backend (LLM_CONCURRENCY, LLM_TIMEOUT)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "ollama")
 
-CSV_FILE = "../data/processed/cleaned_csv_data.csv"
+logbook = get_logbook()
+llm_cache = LLMCache()
+intent_classifier = IntentClassifier(load_keywords())
+intent_stats = IntentStats()
+input_extractor = InputExtractor(signal_registry)
 
-    
+def backend():
+    return get_backend(LLM_BACKEND)
 
-def load_csv():
-    """Loads the CSV into a Pandas DataFrame and cleans column names."""
-    try:
-        df = pd.read_csv(CSV_FILE, dtype={
-            "fecha": "string",
-            "hora": "string",
-            "validada": "string"
-        }, low_memory=False)
-        df.columns = df.columns.str.strip().str.lower()
-        return df.astype(str)
-    except Exception as e:
-        print(f"Error loading CSV: {e}")
-        return None
+def generate(prompt):
+    """Realiza una consulta al modelo y devuelve la respuesta."""
+    return backend().generate(prompt)
 
-data = load_csv()
+def generate_stream(prompt):
+    """Consulta el modelo y genera los fragmentos de la respuesta según llegan."""
+    yield from backend().generate_stream(prompt)
 
-def query_llm(prompt):
-    """Realiza una consulta al modelo Ollama y devuelve la respuesta."""
-    response = ollama.chat(
-        model=LLM_MODEL,
-        messages=[{"role": "user", "content": prompt}]
-    )["message"]["content"].strip()
-    return response
+def query_llm(prompt, user_input=None, kind=None, stream=False):
+    """
+    Consulta el modelo pasando por la caché de respuestas. `user_input` y
+    `kind` (tipo de prompt) permiten reutilizar preguntas casi iguales. Con
+    `stream=True` devuelve un generador de fragmentos de texto.
+    """
+    if stream:
+        return llm_cache.cached_stream(backend().model_id, prompt, generate_stream, user_input, kind)
+    return llm_cache.cached_call(backend().model_id, prompt, generate, user_input, kind)
 
 def parse_user_input_for_shot_number(user_input):
-    """Extrae el número de descarga (shot number) del input del usuario."""
+    """Extrae el número de descarga (shot number) del input del usuario; el LLM sólo si no aparece literalmente."""
+    shot_number = input_extractor.shot_number(user_input)
+    if shot_number is not None:
+        return shot_number
+
     prompt = f"""
     You are an AI that extracts the first full number from the user request.
     - The number represents the shot (discharge) number.
@@ -58,7 +66,7 @@ def parse_user_input_for_shot_number(user_input):
     Example Output:
     57546
     """
-    response = query_llm(prompt).strip()
+    response = query_llm(prompt, user_input, "shot").strip()
 
     match = re.search(r"\d+", response)
     
@@ -70,34 +78,18 @@ def parse_user_input_for_shot_number(user_input):
         return None
 
     
-def clean_answer(user_input):
-    """Limpia la respuesta usando el modelo LLM."""
-    prompt = f"""
-    You are an AI that cleans user input and returns a clear and concise version.
-    
-    Clean the following input:
-    "{user_input}"
-    
-    Example Input 1:
-    "Success: Spectrogram 56950 MHD? Yes"
-    Example Output 1:
-    "The spectogram 56950 has MHD"
-    Example Input 2:
-    "Success: Spectrogram 56950 MHD? No"
-    Example Output 1:
-    "The spectogram 56950 does not have MHD"
-
-    Return ONLY the cleaned response as a string, with no extra words, no explanations, no formatting.
-    """
-    return query_llm(prompt)
-
 def parse_user_input_with_ai(user_input):
-    """Extracts structured data from user input."""
+    """Extracts structured data from user input, asking the LLM only if the regex extractor fails."""
+    parsed_response = input_extractor.extract(user_input)
+    if parsed_response is not None:
+        print("Extracted:", parsed_response)
+        return parsed_response
+
     prompt = f"""
     You are an AI that extracts structured data from user requests for plasma diagnostics.
     The user will provide a request in natural language, and you must extract the following fields:
 
-    - "shot": integer (discharge number)
+    - "shot": integer (discharge number), or a list of integers if the user asks for several discharges
     - "tstart": float (start time in seconds, default is 0.00 if not provided)
     - "tstop": float (stop time in seconds, default is 2000.00 if not provided)
     - "signals": list of signal names (always as an array, even if only one signal is given)
@@ -112,7 +104,7 @@ def parse_user_input_with_ai(user_input):
     "{user_input}"
     """
 
-    response = query_llm(prompt).strip()
+    response = query_llm(prompt, user_input, "extract").strip()
     print("Raw AI Response:", response)
 
     json_match = re.search(r"\{.*\}", response, re.DOTALL)
@@ -130,14 +122,27 @@ def parse_user_input_with_ai(user_input):
     print("Error: No valid JSON found in response")
     return None
 
-def determine_intent(user_input):
-    """Usa el modelo de IA para determinar si la solicitud es sobre CSV, gráficos, predicción o una consulta general."""
-    user_input_lower = user_input.lower()
-    contains_signal = any(signal in user_input_lower for signal in valid_signals)
+def mhd_results_question(user_input):
+    """True si la pregunta pide las descargas con MHD y existe la tabla `mhd` para responderla."""
+    return intent_classifier.asks_mhd_results(user_input) and logbook.available() and logbook.has_results()
 
-    if contains_signal:
+def determine_intent(user_input):
+    """
+    Determina si la solicitud es sobre CSV, gráficos, predicción o una consulta general.
+    Los casos claros los resuelve el clasificador local; sólo se pregunta al
+    LLM cuando su confianza es baja.
+    """
+    start = time.perf_counter()
+    if signal_registry.mentions_signal(user_input):
+        intent_stats.record("PLOT", "signal", time.perf_counter() - start)
         return "PLOT"
 
+    intent, confidence, source = intent_classifier.classify(user_input, mhd_results_question(user_input))
+    if intent is not None:
+        intent_stats.record(intent, source, time.perf_counter() - start)
+        print(f"INTENT: {intent} ({source}, confidence {confidence:.2f})")
+        return intent
+
     prompt = f"""
     You are an AI that classifies user requests related to plasma diagnostics.
     The possible categories are:
@@ -168,7 +173,7 @@ def determine_intent(user_input):
     - "Explica qué significa ICX" → GENERAL
     """
 
-    response = query_llm(prompt).strip()
+    response = query_llm(prompt, user_input, "intent").strip()
     print(response)
 
     last_line = response.split("\n")[-1].strip().upper()
@@ -180,12 +185,27 @@ def determine_intent(user_input):
     if last_line not in valid_intents:
         last_line = "PREDICT"
 
+    intent_stats.record(last_line, "llm", time.perf_counter() - start)
     print(f"INTENT: {last_line}")
     return last_line
 
 
+def guess_intent(user_input):
+    """
+    Intención más probable según el registro de señales y las reglas, sin
+    llamar nunca al LLM (sirve para adelantar trabajo mientras se decide la
+    intención real). None si no hay ninguna pista.
+    """
+    if signal_registry.mentions_signal(user_input):
+        return "PLOT"
+    if mhd_results_question(user_input):
+        return "CSV"
+    scores = intent_classifier.scores(user_input)
+    intent = max(scores, key=scores.get)
+    return intent if scores[intent] > 0 else None
 
-def ask_general_ai(user_input):
+
+def ask_general_ai(user_input, stream=False):
     """Queries the AI model to answer general questions."""
     prompt = f"""
     You are an advanced AI that provides helpful, clear, and concise answers.
@@ -194,7 +214,7 @@ def ask_general_ai(user_input):
     "{user_input}"
     """
 
-    return query_llm(prompt)
+    return query_llm(prompt, user_input, "general", stream=stream)
 
 def clean_csv_answers(user_input):
     """Queries the AI model to answer general questions."""
@@ -205,49 +225,67 @@ def clean_csv_answers(user_input):
     "{user_input}"
     """
 
-    return query_llm(prompt)
+    return query_llm(prompt, user_input, "general")
 
-def execute_sql_query(sql_query, question):
-    """Executes an SQL query on the loaded DataFrame."""
-    if data is None:
-        return {"error": "CSV data not loaded."}
+def execute_sql_query(sql_query, question, stream=False):
+    """
+    Executes an SQL query on the persistent SQLite copy of the CSV and
+    returns (answer, table). The answer comes from the templates of
+    `response_templates`; only unusual result shapes are described by the
+    LLM (with `LLM_FOR_UNUSUAL_RESULTS`). `table` is a DataFrame to display,
+    or None.
+    """
+    if not logbook.available():
+        return {"error": "CSV data not loaded."}, None
 
     try:
-        result = ps.sqldf(sql_query, {"data": data})
+        result = logbook.query(sql_query)
+    except Exception as e:
+        return {"error": f"SQL Execution Error: {e}"}, None
 
-        result_json = result.to_dict(orient="records")
-        
-        print(result_json)
+    text, table = render_sql_result(result, detect_language(question))
+    if text is not None:
+        return text, table
 
-        prompt = f"""
-        You are an AI that translates JSON to natural language.
-        
-        Convert the following JSON into a precise natural language description:
-        "{result_json}", and then using the folowing question: "{question}", wich is the question to that answer
-        we want, to give a better and more define answer
+    result_json = table.to_dict(orient="records")
+    prompt = f"""
+    You are an AI that translates JSON to natural language.
+    
+    Convert the following JSON into a precise natural language description:
+    "{result_json}", and then using the folowing question: "{question}", wich is the question to that answer
+    we want, to give a better and more define answer. The JSON only contains the first {len(table)} of {len(result)} rows.
 
-        - If the response contains numbers, use numerical digits instead of words
+    - If the response contains numbers, use numerical digits instead of words
 
-        Return ONLY the natural language response with no extra text, no comments, no explanations.
-        """
+    Return ONLY the natural language response with no extra text, no comments, no explanations.
+    """
+    return query_llm(prompt, stream=stream), table
 
-        response = query_llm(prompt)
-        return response
-    except Exception as e:
-        return {"error": f"SQL Execution Error: {e}"}
 
+def mhd_table_description():
+    """Describe the MHD results table for the SQL prompt, if a campaign scan has been run."""
+    if not logbook.has_results():
+        return ""
+    return """
+        There is also a table 'mhd' with the MHD classification of each discharge (columns: shot, mhd, probability).
+        - `mhd = 1` means the discharge has MHD and `mhd = 0` means it does not.
+        - To combine it with the logbook use `FROM data JOIN mhd ON data.n_descarga = mhd.shot`.
+        """
 
-def query_csv(question: str):
-    """Processes a natural language question and converts it into an SQL query."""
-    if data is None:
-        return {"error": "CSV data not loaded."}
+def query_csv(question: str, stream=False):
+    """
+    Processes a natural language question and converts it into an SQL query.
+    Returns (answer, table) like `execute_sql_query`.
+    """
+    if not logbook.available():
+        return {"error": "CSV data not loaded."}, None
 
     prompt = f"""
         You are an AI that translates user queries into precise SQL queries.
         The table name is 'data' and contains the following columns:
 
-        {', '.join(data.columns)}
-
+        {', '.join(logbook.columns())}
+        {mhd_table_description()}
         Follow these strict rules:
         - Always generate a valid SQL query.
         - Always include `FROM data` in the query.
@@ -275,12 +313,12 @@ def query_csv(question: str):
         Return ONLY the SQL query, with no extra text, no comments, no explanations, and no Markdown formatting.
     """
 
-    sql_query = query_llm(prompt).strip()
+    sql_query = query_llm(prompt, question, "sql").strip()
     print("Generated SQL Query:", sql_query) 
 
     sql_query = sql_query.split(";")[0].strip()
 
     if not sql_query.lower().startswith("select"):
-        return {"error": "Invalid SQL query generated."}
+        return {"error": "Invalid SQL query generated."}, None
 
-    return execute_sql_query(sql_query, question)
\ No newline at end of file
+    return execute_sql_query(sql_query, question, stream=stream)
\ No newline at end of file
@@ -1,5 +1,7 @@
 import requests
 import re
+import numpy as np
+from signal_cache import slice_window
 
 def generate_url(base_url, shot, nsignal, signals, factors, tstart, tstop):
     """Generates a URL to fetch signal data."""
@@ -15,20 +17,105 @@ def generate_url(base_url, shot, nsignal, signals, factors, tstart, tstop):
     url += f"&tstart={tstart:.2f}&tstop={tstop:.2f}"
     return url
 
-def fetch_data(url):
+def fetch_data(url, session=None, timeout=None):
     """Fetches data from the URL."""
-    response = requests.get(url, verify=False)
+    response = (session or requests).get(url, verify=False, timeout=timeout)
     return response.text if response.status_code == 200 else None
 
+DATA_BLOCK_HEADER = re.compile(r"var data(\d{2}) = \[")
+BRACKETS_TO_SPACES = str.maketrans("[]", "  ")
+
+def index_data_blocks(html_content):
+    """Localiza una sola vez cada bloque `var dataNN = [...]` y lo indexa por su número."""
+    blocks = {}
+    position = 0
+    while True:
+        header = DATA_BLOCK_HEADER.search(html_content, position)
+        if not header:
+            break
+        end = html_content.find("];", header.end())
+        if end == -1:
+            break
+        blocks.setdefault(int(header.group(1)), (header.end(), end))
+        position = end + 2
+    return blocks
+
+def decode_data_block(data_block):
+    """Convierte un bloque `[x,y],[x,y],...` en dos arrays float64 contiguos (x, y)."""
+    values = np.fromstring(data_block.translate(BRACKETS_TO_SPACES), dtype=np.float64, sep=",")
+    if values.size % 2:
+        raise ValueError("Data block has an odd number of values")
+    points = values.reshape(-1, 2)
+    return np.ascontiguousarray(points[:, 0]), np.ascontiguousarray(points[:, 1])
+
 def extract_data_points(html_content, signals):
-    """Extracts data from HTML content."""
+    """Extracts data from HTML content as {signal: (x, y)} NumPy arrays."""
     data_points_dict = {}
-    matches = list(re.finditer(r"var data(\d{2}) = \[(.*?)\];", html_content, re.DOTALL))
-    for signal_name in signals:
-        match = next((m for m in matches if f"var data{signals.index(signal_name)+1:02}" in m.group(0)), None)
-        if match:
-            data_block = match.group(2)
-            data_points = [tuple(map(float, line.strip('[]').split(','))) for line in data_block.split('],[')]
-            data_points_dict[signal_name] = data_points
+    blocks = index_data_blocks(html_content)
+    for number, signal_name in enumerate(signals, start=1):
+        if signal_name in data_points_dict or number not in blocks:
+            continue
+        start, end = blocks[number]
+        try:
+            data_points_dict[signal_name] = decode_data_block(html_content[start:end])
+        except ValueError as e:
+            print(f"Error decoding data block {number:02} ({signal_name}): {e}")
     return data_points_dict
 
+def split_cached(shot, signals, factors, tstart, tstop, cache=None):
+    """
+    Separa las señales servidas desde la caché de las que hay que descargar.
+
+    Devuelve ({señal: (x, y)} en caché, {señal: factor} pendientes, ventana a
+    pedir). La ventana pedida es la unión con la ya guardada para que la
+    entrada de caché crezca.
+    """
+    data_arrays = {}
+    missing = {}
+    for i, signal_name in enumerate(signals):
+        factor = factors[i] if factors and i < len(factors) else "1.00"
+        cached = cache.get(shot, signal_name, factor, tstart, tstop) if cache else None
+        if cached is not None:
+            data_arrays[signal_name] = cached
+        else:
+            missing[signal_name] = factor
+
+    fetch_start, fetch_stop = tstart, tstop
+    if cache:
+        for signal_name, factor in missing.items():
+            window = cache.window(shot, signal_name, factor)
+            if window:
+                fetch_start = min(fetch_start, window[0])
+                fetch_stop = max(fetch_stop, window[1])
+
+    return data_arrays, missing, (fetch_start, fetch_stop)
+
+def store_fetched(html_content, shot, missing, fetch_window, tstart, tstop, cache=None):
+    """Parsea una respuesta de la CGI, la guarda en caché y la recorta a [tstart, tstop]."""
+    data_arrays = {}
+    for signal_name, (x, y) in extract_data_points(html_content, list(missing)).items():
+        if not len(x):
+            continue
+        if cache:
+            cache.put(shot, signal_name, missing[signal_name], fetch_window[0], fetch_window[1], x, y)
+        data_arrays[signal_name] = slice_window(x, y, tstart, tstop)
+    return data_arrays
+
+def fetch_signals(base_url, shot, signals, tstart, tstop, factors=None, cache=None):
+    """
+    Devuelve {señal: (x, y)} para un shot, sirviendo desde la caché en disco
+    todo lo posible y pidiendo a la CGI sólo las señales que faltan.
+    """
+    tstart = 0 if tstart is None else tstart
+    tstop = 2000 if tstop is None else tstop
+
+    data_arrays, missing, fetch_window = split_cached(shot, signals, factors, tstart, tstop, cache)
+    if not missing:
+        return data_arrays
+
+    url = generate_url(base_url, shot, len(missing), list(missing), list(missing.values()), *fetch_window)
+    html_content = fetch_data(url)
+    if html_content:
+        data_arrays.update(store_fetched(html_content, shot, missing, fetch_window, tstart, tstop, cache))
+
+    return data_arrays
@@ -0,0 +1,39 @@
+import numpy as np
+
+# Una imagen de 10x6 pulgadas a 100 dpi tiene unas 1000 columnas de píxeles;
+# con un mínimo y un máximo por columna (y algo de margen) basta con 4000 puntos.
+PLOT_MAX_POINTS = 4000
+
+def minmax_decimate(x, y, max_points=PLOT_MAX_POINTS):
+    """
+    Reduce una señal a como mucho `max_points` puntos conservando, en cada
+    intervalo, la muestra mínima y la máxima. Así se mantienen los picos
+    (ráfagas MHD, spikes) que un submuestreo uniforme perdería.
+
+    Los arrays float64 se procesan sin copiar; cualquier otra secuencia se
+    convierte primero a NumPy.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    n_points = len(y)
+    if max_points is None or n_points <= max_points:
+        return x, y
+
+    n_buckets = max((max_points - 2) // 2, 1)
+    bucket_size = -(-n_points // n_buckets)
+    full = (n_points // bucket_size) * bucket_size
+
+    buckets = y[:full].reshape(-1, bucket_size)
+    offsets = np.arange(buckets.shape[0]) * bucket_size
+    first = offsets + buckets.argmin(axis=1)
+    second = offsets + buckets.argmax(axis=1)
+
+    indices = [np.minimum(first, second), np.maximum(first, second)]
+    if full < n_points:
+        tail = y[full:]
+        indices.append(np.array([full + tail.argmin(), full + tail.argmax()]))
+
+    # np.unique ordena los índices y elimina los repetidos (mínimo == máximo)
+    keep = np.unique(np.concatenate(indices))
+    return x[keep], y[keep]
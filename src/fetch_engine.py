@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from data_fetcher import generate_url, split_cached, store_fetched
+
+FetchJob = namedtuple("FetchJob", ["shot", "signals", "tstart", "tstop", "factors"],
+                      defaults=(0, 2000, None))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class FetchEngine:
+    """
+    Motor de descargas concurrentes de TJII_data.cgi.
+
+    Recibe una lista de FetchJob (shot, señales, ventana) y los resuelve en un
+    pool de hilos acotado que comparte una `requests.Session` con conexiones
+    keep-alive. Limita las peticiones simultáneas por host, aplica timeouts y
+    reintentos con espera exponencial, y divide los `nsignal` grandes en
+    varias peticiones más pequeñas que se lanzan en paralelo.
+    """
+
+    def __init__(self, base_url, max_workers=8, per_host_limit=4, timeout=(5, 60),
+                 retries=3, backoff=0.5, max_signals_per_request=8, cache=None):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_signals_per_request = max_signals_per_request
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=per_host_limit, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tjii-fetch")
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+
+    def get(self, url):
+        """Descarga una URL con límite por host, timeout y reintentos exponenciales."""
+        semaphore = self._host_semaphore(url)
+        for attempt in range(self.retries + 1):
+            try:
+                with semaphore:
+                    response = self.session.get(url, verify=False, timeout=self.timeout)
+                if response.status_code == 200:
+                    return response.text
+                if response.status_code not in RETRY_STATUS:
+                    print(f"Error: {url} returned HTTP {response.status_code}")
+                    return None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                print(f"Warning: Request failed ({e}), attempt {attempt + 1} of {self.retries + 1}")
+
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        return None
+
+    def _fetch_chunk(self, shot, missing, fetch_window, tstart, tstop):
+        url = generate_url(self.base_url, shot, len(missing), list(missing), list(missing.values()), *fetch_window)
+        html_content = self.get(url)
+        if not html_content:
+            return {}
+        return store_fetched(html_content, shot, missing, fetch_window, tstart, tstop, self.cache)
+
+    def _chunks(self, missing):
+        names = list(missing)
+        for i in range(0, len(names), self.max_signals_per_request):
+            yield {name: missing[name] for name in names[i:i + self.max_signals_per_request]}
+
+    def run(self, jobs):
+        """
+        Resuelve todos los trabajos en paralelo.
+
+        Devuelve {shot: {señal: (x, y)}}; las señales que no se pudieron
+        descargar no aparecen en el diccionario de su shot.
+        """
+        results = {}
+        pending = []
+
+        for job in jobs:
+            job = FetchJob(*job)
+            tstart = 0 if job.tstart is None else job.tstart
+            tstop = 2000 if job.tstop is None else job.tstop
+
+            cached, missing, fetch_window = split_cached(job.shot, job.signals, job.factors,
+                                                         tstart, tstop, self.cache)
+            results.setdefault(job.shot, {}).update(cached)
+
+            for chunk in self._chunks(missing):
+                future = self._executor.submit(self._fetch_chunk, job.shot, chunk, fetch_window, tstart, tstop)
+                pending.append((job.shot, future))
+
+        for shot, future in pending:
+            try:
+                results[shot].update(future.result())
+            except Exception as e:
+                print(f"Error fetching data for shot {shot}: {e}")
+
+        return results
+
+    def fetch(self, shot, signals, tstart=0, tstop=2000, factors=None):
+        """Atajo para un único shot: devuelve {señal: (x, y)}."""
+        return self.run([FetchJob(shot, signals, tstart, tstop, factors)]).get(shot, {})
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,197 @@
+"""
+Extracción determinista de shots, ventana temporal y señales de la pregunta.
+
+La mayoría de peticiones de gráficos y predicciones escriben los datos
+literalmente ("señal ECE7 del shot 57546 entre 1050 y 1250 ms"), así que se
+leen con expresiones regulares y los parsers sólo recurren al LLM cuando no
+se encuentra lo necesario. Los nombres de señal se buscan con el registro de
+`signal_registry`.
+"""
+import re
+
+from signal_registry import get_registry
+
+DEFAULT_TSTART = 0.0
+DEFAULT_TSTOP = 2000.0
+
+NUMBER = r"(\d+(?:[.,]\d+)?)"
+UNIT = r"(?:\s*(ms|milisegundos?|milliseconds?|s|seg|segundos?|seconds?)\b)?"
+
+# Rangos completos: "from 1000 to 1200 ms", "entre 1050 y 1250", "1000-1200 ms", "[1000, 1200]"
+TIME_RANGE_PATTERNS = [
+    re.compile(r"\b(?:from|between|entre|desde|de)\s+" + NUMBER + UNIT + r"\s*(?:to|and|y|a|hasta|-)\s*" + NUMBER + UNIT,
+               re.IGNORECASE),
+    re.compile(r"\b(?:tstart|t_start|tmin|t0)\s*[=:]?\s*" + NUMBER + UNIT + r".*?\b(?:tstop|t_stop|tmax|t1)\s*[=:]?\s*"
+               + NUMBER + UNIT, re.IGNORECASE),
+    re.compile(r"\[\s*" + NUMBER + r"\s*,\s*" + NUMBER + r"\s*\]" + UNIT, re.IGNORECASE),
+    re.compile(r"(?<![\w.])" + NUMBER + r"\s*-\s*" + NUMBER + r"\s*(ms|s)\b", re.IGNORECASE),
+]
+# Un solo límite: "desde 1000 ms", "hasta 1200", "until 1.2 s"
+TIME_START_PATTERN = re.compile(r"\b(?:from|after|since|desde|a partir de)\s+" + NUMBER + UNIT, re.IGNORECASE)
+TIME_STOP_PATTERN = re.compile(r"\b(?:to|until|up to|before|hasta)\s+" + NUMBER + UNIT, re.IGNORECASE)
+
+SHOT_PATTERN = re.compile(r"(?<![\w.])(\d{4,6})(?!\w)(?!\.\d)(?!\s*(?:ms|s|seg|segundos?|seconds?)\b)", re.IGNORECASE)
+# Varios shots sólo si van unidos explícitamente: "57546 and 57550", "57546 a 57550", "shots 57546, 57547"
+SHOT_JOINER = re.compile(r"\s*(?:(?P<symbol>[,-])\s*(?:(?:and|y)\s+)?|(?P<word>and|y|or|o|to|a|hasta|through|&)\s+)",
+                         re.IGNORECASE)
+# "57546 to 57550", "57546 a 57550", "shots 57546-57550" piden todos los shots del rango
+RANGE_WORDS = {"to", "a", "hasta", "through"}
+# Rangos más largos se dejan al LLM en lugar de pedir decenas de descargas
+MAX_SHOT_RANGE = 10
+# "in 2024", "de 2024": un año, no una descarga
+YEAR_PREFIX = re.compile(r"\b(?:en|in|de|del|of|during|durante|year|año)\s+$", re.IGNORECASE)
+SHOTS_PLURAL = re.compile(r"\b(?:shots|discharges|descargas|disparos)\b", re.IGNORECASE)
+# Ventana sin palabras justo después del shot: "shot 57546 1000-1200", "shot 57546 1000 1200 ms"
+BARE_WINDOW_PATTERN = re.compile(r"\s+" + NUMBER + r"(?:\s*-\s*|\s+)" + NUMBER + UNIT + r"(?![\w.])", re.IGNORECASE)
+
+def to_ms(value, unit):
+    """Convierte un valor a milisegundos (la unidad de TJII_data.cgi)."""
+    value = float(value.replace(",", "."))
+    if unit and unit.lower().startswith("s"):
+        return value * 1000
+    return value
+
+def looks_like_shot(value, unit):
+    """Un número de más de 4 cifras sin unidad es un shot ("de 57546 a 57550"), no un tiempo."""
+    return not unit and len(value.split(".")[0].split(",")[0]) > 4
+
+def _range_groups(match):
+    """(inicio, unidad, fin, unidad) de cualquiera de los patrones de rango."""
+    groups = match.groups()
+    if len(groups) == 3:
+        # "[a, b] ms" y "a-b ms" llevan una sola unidad para los dos valores
+        return groups[0], groups[2], groups[1], groups[2]
+    start, start_unit, stop, stop_unit = groups
+    return start, start_unit or stop_unit, stop, stop_unit or start_unit
+
+def extract_time_window(user_input):
+    """
+    Devuelve (tstart, tstop, spans): la ventana en ms (None si no se indica)
+    y los tramos del texto que ocupan, para no confundirlos con shots.
+    """
+    for pattern in TIME_RANGE_PATTERNS:
+        for match in pattern.finditer(user_input):
+            start, start_unit, stop, stop_unit = _range_groups(match)
+            if looks_like_shot(start, start_unit) or looks_like_shot(stop, stop_unit):
+                continue
+            return to_ms(start, start_unit), to_ms(stop, stop_unit), [match.span()]
+
+    tstart = tstop = None
+    spans = []
+    for pattern in (TIME_START_PATTERN, TIME_STOP_PATTERN):
+        for match in pattern.finditer(user_input):
+            value, unit = match.groups()
+            # "desde la descarga 57546" o "hasta 57550" son shots, no tiempos
+            if looks_like_shot(value, unit):
+                continue
+            if pattern is TIME_START_PATTERN:
+                tstart = to_ms(value, unit)
+            else:
+                tstop = to_ms(value, unit)
+            spans.append(match.span())
+            break
+    return tstart, tstop, spans
+
+def is_year(user_input, match):
+    """True si el número es un año precedido de "en", "in", "de", "del"..."""
+    value = match.group(1)
+    return (len(value) == 4 and value[:2] in ("19", "20")
+            and YEAR_PREFIX.search(user_input, 0, match.start()) is not None)
+
+def shot_candidates(user_input, exclude_spans=()):
+    """Números de 4 a 6 cifras sin unidad, en orden de aparición, fuera de los tramos excluidos."""
+    return [match for match in SHOT_PATTERN.finditer(user_input)
+            if not any(start <= match.start() < stop for start, stop in exclude_spans)]
+
+def group_shots(user_input, candidates):
+    """
+    Devuelve (shots, fin, resto): el primer número y los que le siguen unidos
+    por "and", "y", "to", "a"... (o por comas y guiones si la pregunta habla
+    de "shots"/"descargas"), la posición donde acaba el grupo y los números
+    que quedan fuera de él. Los shots unidos tienen las mismas cifras que el
+    primero, así que "57546 and 1100" no es una lista de shots. "to", "a",
+    "hasta" y el guion piden un rango, que se expande; si es descendente o de
+    más de `MAX_SHOT_RANGE` shots devuelve None.
+    """
+    first = candidates[0]
+    plural = SHOTS_PLURAL.search(user_input, 0, first.start()) is not None
+    shots, end = [int(first.group(1))], first.end()
+    for i, match in enumerate(candidates[1:], 1):
+        joiner = SHOT_JOINER.fullmatch(user_input, end, match.start())
+        if (joiner is None or (joiner.group("symbol") and not plural)
+                or len(match.group(1)) != len(first.group(1))):
+            return shots, end, candidates[i:]
+        shot = int(match.group(1))
+        if joiner.group("symbol") == "-" or (joiner.group("word") or "").lower() in RANGE_WORDS:
+            if not shots[-1] < shot < shots[-1] + MAX_SHOT_RANGE:
+                return None
+            shots.extend(s for s in range(shots[-1] + 1, shot + 1) if s not in shots)
+        elif shot not in shots:
+            shots.append(shot)
+        end = match.end()
+    return shots, end, []
+
+def extract_shots_and_window(user_input):
+    """
+    Devuelve (shots, tstart, tstop), con la ventana en ms o None, o None si
+    queda algún número que no se sabe interpretar ("at 1100", "in 2024"):
+    en ese caso es mejor preguntar al LLM que pedir un shot que no existe.
+    Un año ("shots in 2024") nunca se toma como shot.
+    """
+    tstart, tstop, spans = extract_time_window(user_input)
+    candidates = shot_candidates(user_input, spans)
+    if any(is_year(user_input, candidate) for candidate in candidates):
+        return None
+    if not candidates:
+        return [], tstart, tstop
+
+    grouped = group_shots(user_input, candidates)
+    if grouped is None:
+        return None
+    shots, end, extra = grouped
+    if tstart is None and tstop is None:
+        match = BARE_WINDOW_PATTERN.match(user_input, end)
+        if match:
+            start, stop, unit = match.groups()
+            if not looks_like_shot(start, unit) and not looks_like_shot(stop, unit):
+                tstart, tstop = to_ms(start, unit), to_ms(stop, unit)
+                extra = [candidate for candidate in extra if candidate.start() >= match.end()]
+    if extra:
+        return None
+    return shots, tstart, tstop
+
+
+class InputExtractor:
+    """Extrae shot(s), tstart, tstop y señales con el mismo formato que devuelve el LLM."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or get_registry()
+
+    def shot_number(self, user_input):
+        """El número de descarga si la pregunta menciona exactamente uno, si no None."""
+        parsed = extract_shots_and_window(user_input)
+        return parsed[0][0] if parsed is not None and len(parsed[0]) == 1 else None
+
+    def extract(self, user_input):
+        """
+        Devuelve {"shot", "tstart", "tstop", "signals"} o None si falta el
+        shot o las señales, o si sobra algún número. "shot" es un entero o una lista si hay varios.
+        """
+        parsed = extract_shots_and_window(user_input)
+        signals = self.registry.find(user_input)
+        if parsed is None or not parsed[0] or not signals:
+            return None
+
+        shots, tstart, tstop = parsed
+
+        tstart = DEFAULT_TSTART if tstart is None else tstart
+        tstop = DEFAULT_TSTOP if tstop is None else tstop
+        if tstart >= tstop:
+            return None
+
+        return {
+            "shot": shots[0] if len(shots) == 1 else shots,
+            "tstart": tstart,
+            "tstop": tstop,
+            "signals": signals,
+        }
@@ -0,0 +1,190 @@
+"""
+Clasificador de intención local que evita la llamada al LLM en los casos claros.
+
+Puntúa la pregunta con reglas (expresiones regulares con peso) y con las
+palabras de `config/keywords.txt`. Si la intención ganadora tiene suficiente
+puntuación y confianza se devuelve directamente; si no, se puede consultar
+un modelo scikit-learn opcional (`config/intent_model.pkl`) y, en último
+término, el LLM. `IntentStats` registra la latencia por intención y cuántas
+veces hubo que recurrir al LLM.
+
+Las preguntas sobre varias descargas con MHD ("¿qué descargas de 2024
+tuvieron MHD?") son consultas a la tabla `mhd` de `mhd_scan`, no
+predicciones: con `mhd_results=True` se clasifican como CSV.
+
+Uso (entrenar el modelo opcional a partir de un TSV "pregunta<TAB>INTENCIÓN"):
+    python intent_classifier.py train ejemplos.tsv
+"""
+import argparse
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+INTENTS = ("PLOT", "CSV", "PREDICT", "GENERAL")
+INTENT_MODEL_PATH = "config/intent_model.pkl"
+
+CONFIDENCE_THRESHOLD = 0.75
+MIN_SCORE = 2.0
+KEYWORD_WEIGHT = 0.5
+
+# (intención, patrón sobre el texto en minúsculas y sin tildes, peso)
+RULES = [
+    ("PREDICT", r"\bmhd\b", 3.0),
+    ("PREDICT", r"\bespect?rogram", 3.0),
+    ("PREDICT", r"\bspect?rogram", 3.0),
+    ("PREDICT", r"\bdesorden(es)? magnetohidrodinamic", 3.0),
+    ("CSV", r"\bcuant[oa]s?\b", 3.0),
+    ("CSV", r"\bhow many\b", 3.0),
+    ("CSV", r"\b(numero|cantidad|total) de (descargas|disparos|shots|registros)\b", 3.0),
+    ("CSV", r"\bcount\b", 2.0),
+    ("CSV", r"\b(que|which|what) (fecha|dia|hora|date|day|time)\b", 2.5),
+    ("CSV", r"\b(ultima|primera|last|first) (descarga|shot|discharge)\b", 2.5),
+    ("CSV", r"\b(tabla|table|csv|registro|registros|records)\b", 2.0),
+    ("CSV", r"\b(maximo|minimo|maxima|minima|maximum|minimum|media|promedio|average)\b", 1.5),
+    ("CSV", r"\bconfiguraci(on|ones)\b", 1.5),
+    ("CSV", r"\b(en|in|del|de) (19|20)\d{2}\b", 1.0),
+    ("PLOT", r"\b(grafic|dibuj|represent|visualiz|traz|superpon)\w*", 3.0),
+    ("PLOT", r"\b(plot|plots|graph|chart|draw|display)\b", 3.0),
+    ("PLOT", r"\b(senal|senales|signal|signals)\b", 1.0),
+    ("GENERAL", r"^\s*¿?\s*(que|what) (es|son|is|are|significa|means?)\b", 2.5),
+    ("GENERAL", r"\b(explica|explicame|explain|define|definicion|describe)\b", 2.5),
+    ("GENERAL", r"\b(por que|why|como funciona|how does)\b", 2.0),
+]
+
+# Preguntas en plural sobre MHD: se responden con la tabla de resultados de la campaña
+MHD_RESULTS_PATTERN = re.compile(r"\b(which|what|how many|list|que|cuales|cuantas|cuantos|lista)\b.*"
+                                 r"\b(shots|discharges|descargas|disparos)\b.*\bmhd\b")
+
+def normalize_text(text):
+    """Minúsculas y sin tildes, para que 'cuántos' y 'cuantos' coincidan."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class IntentStats:
+    """Contadores de latencia por intención y de recurso al LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.total_latency = defaultdict(float)
+        self.sources = defaultdict(int)
+
+    def record(self, intent, source, latency):
+        with self._lock:
+            self.counts[intent] += 1
+            self.total_latency[intent] += latency
+            self.sources[source] += 1
+
+    def summary(self):
+        with self._lock:
+            total = sum(self.sources.values())
+            return {
+                "requests": total,
+                "llm_fallback_rate": self.sources["llm"] / total if total else 0.0,
+                "sources": dict(self.sources),
+                "mean_latency": {intent: self.total_latency[intent] / count
+                                 for intent, count in self.counts.items()},
+            }
+
+
+class IntentClassifier:
+    """Clasificador por reglas y palabras clave, con modelo scikit-learn opcional."""
+
+    def __init__(self, keywords=(), threshold=CONFIDENCE_THRESHOLD, model_path=INTENT_MODEL_PATH):
+        self.threshold = threshold
+        self.rules = [(intent, re.compile(pattern), weight) for intent, pattern, weight in RULES]
+        normalized = sorted({normalize_text(keyword) for keyword in keywords if keyword}, key=len, reverse=True)
+        self.keyword_pattern = (re.compile(r"\b(" + "|".join(map(re.escape, normalized)) + r")\b")
+                                if normalized else None)
+        self.model = self._load_model(model_path)
+
+    @staticmethod
+    def _load_model(model_path):
+        if not model_path or not os.path.exists(model_path):
+            return None
+        import joblib
+        return joblib.load(model_path)
+
+    def scores(self, user_input):
+        """Puntuación de cada intención según las reglas y las palabras clave."""
+        text = normalize_text(user_input)
+        scores = dict.fromkeys(INTENTS, 0.0)
+        for intent, pattern, weight in self.rules:
+            if pattern.search(text):
+                scores[intent] += weight
+        if self.keyword_pattern:
+            # keywords.txt contiene vocabulario de gráficos y señales
+            scores["PLOT"] += KEYWORD_WEIGHT * len(set(self.keyword_pattern.findall(text)))
+        return scores
+
+    def classify_rules(self, user_input):
+        """Devuelve (intención, confianza) según las reglas; confianza 0 si no hay pistas suficientes."""
+        scores = self.scores(user_input)
+        intent = max(scores, key=scores.get)
+        total = sum(scores.values())
+        if scores[intent] < MIN_SCORE or total == 0:
+            return intent, 0.0
+        return intent, scores[intent] / total
+
+    def asks_mhd_results(self, user_input):
+        """True si la pregunta pide las descargas con MHD ("which shots in 2024 had MHD?")."""
+        return MHD_RESULTS_PATTERN.search(normalize_text(user_input)) is not None
+
+    def classify(self, user_input, mhd_results=False):
+        """
+        Devuelve (intención, confianza, origen) si alguno de los métodos
+        locales supera el umbral, o (None, confianza, None) si hay que
+        preguntar al LLM. `mhd_results` indica si existe la tabla `mhd`.
+        """
+        if mhd_results and self.asks_mhd_results(user_input):
+            return "CSV", 1.0, "mhd results"
+        intent, confidence = self.classify_rules(user_input)
+        if confidence >= self.threshold:
+            return intent, confidence, "rules"
+
+        if self.model is not None:
+            probabilities = self.model.predict_proba([user_input])[0]
+            best = probabilities.argmax()
+            if probabilities[best] >= self.threshold:
+                return str(self.model.classes_[best]), float(probabilities[best]), "model"
+            confidence = max(confidence, float(probabilities[best]))
+
+        return None, confidence, None
+
+def train_intent_model(texts, labels, model_path=INTENT_MODEL_PATH):
+    """Entrena y guarda el modelo opcional: TF-IDF de n-gramas de caracteres + regresión logística."""
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    model = make_pipeline(
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), preprocessor=normalize_text),
+        LogisticRegression(max_iter=1000),
+    )
+    model.fit(texts, labels)
+    joblib.dump(model, model_path)
+    return model
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clasificador local de intenciones")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train", help="Train the optional scikit-learn model")
+    train_parser.add_argument("examples", help="TSV file: question<TAB>INTENT")
+    train_parser.add_argument("--output", default=INTENT_MODEL_PATH)
+    args = parser.parse_args()
+
+    texts, labels = [], []
+    with open(args.examples, "r", encoding="utf-8") as f:
+        for line in f:
+            if "\t" in line:
+                text, label = line.rstrip("\n").rsplit("\t", 1)
+                if label.strip().upper() in INTENTS:
+                    texts.append(text)
+                    labels.append(label.strip().upper())
+
+    train_intent_model(texts, labels, args.output)
+    print(f"Intent model trained on {len(texts)} examples and saved to {args.output}")
@@ -0,0 +1,243 @@
+"""
+Backends de LLM registrados como plugins.
+
+Todos los backends tienen la misma interfaz (`LLMBackend`): `generate`,
+`generate_stream` y `generate_many`, que lanza en paralelo varios prompts
+independientes. En el chatbot, la intención y la extracción de una misma
+pregunta ya se piden a la vez desde la tubería especulativa de `main`, que
+así puede empezar la descarga en cuanto llega la extracción.
+Cada backend limita sus llamadas simultáneas (`LLM_CONCURRENCY`) y reutiliza
+un único cliente por proceso, así que las conexiones HTTP se mantienen
+abiertas entre preguntas; `LLM_TIMEOUT` acota la espera de cada llamada.
+
+Cada backend se registra con `@register_backend(nombre)` y el SDK que
+necesita (ollama, ibm_watson_machine_learning) se importa al crearlo, no al
+importar este módulo: arrancar con Ollama ya no carga el SDK de Watson.
+`get_backend()` elige el backend con la variable de entorno `LLM_BACKEND`
+(por defecto `ollama`) y lo crea una sola vez por proceso. También se acepta
+un backend externo como `"paquete.modulo:Clase"`, que se importa sólo si se
+selecciona. El backend `stub` responde sin red, de forma determinista y con
+un retardo configurable, para pruebas y medidas de latencia.
+"""
+import hashlib
+import importlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_BACKEND = "ollama"
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 120))
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", 2))
+OLLAMA_MODEL = "llama3"
+WATSONX_MODEL = "meta-llama/llama-3-3-70b-instruct"
+WATSONX_PARAMETERS = {
+    "DECODING_METHOD": "greedy",
+    "MIN_NEW_TOKENS": 1,
+    "MAX_NEW_TOKENS": 100
+}
+STUB_LATENCY = float(os.environ.get("LLM_STUB_LATENCY", 0.5))
+STUB_TOKEN_DELAY = float(os.environ.get("LLM_STUB_TOKEN_DELAY", 0.02))
+STUB_WORDS = ["plasma", "shot", "signal", "stellarator", "density", "coil", "field", "mode",
+              "spectrogram", "discharge", "current", "island", "heating", "profile", "edge", "core"]
+
+_BACKENDS = {}
+_instances = {}
+_lock = threading.Lock()
+
+def register_backend(name):
+    """Decorador que registra una clase de backend con el nombre dado."""
+    def decorator(cls):
+        _BACKENDS[name] = cls
+        return cls
+    return decorator
+
+def available_backends():
+    return sorted(_BACKENDS)
+
+def _backend_class(name):
+    if name in _BACKENDS:
+        return _BACKENDS[name]
+    if ":" in name:
+        module_name, class_name = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), class_name)
+    raise ValueError(f"Unknown LLM backend '{name}'. Available: {', '.join(available_backends())}")
+
+def get_backend(name=None):
+    """Backend `name` (o el de `LLM_BACKEND`), creado la primera vez que se pide."""
+    name = name or os.environ.get("LLM_BACKEND", DEFAULT_BACKEND)
+    with _lock:
+        if name not in _instances:
+            _instances[name] = _backend_class(name)()
+        return _instances[name]
+
+
+class LLMBackend(ABC):
+    """
+    Interfaz común. Las subclases implementan `_generate` (si falta, la
+    clase no se puede instanciar) y, si el modelo lo permite,
+    `_generate_stream`; el límite de concurrencia, el plazo y las llamadas
+    en lote se resuelven aquí.
+    """
+
+    model_id = None
+    # True si el cliente no acepta un plazo por llamada: `generate` espera la
+    # respuesta en un hilo del pool y lanza `TimeoutError` al pasar `timeout`
+    timeout_in_thread = False
+
+    def __init__(self, timeout=None, concurrency=None):
+        self.timeout = LLM_TIMEOUT if timeout is None else timeout
+        self.concurrency = concurrency or LLM_CONCURRENCY
+        # Llamadas simultáneas al modelo como máximo (las respuestas en caché no llegan aquí)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @abstractmethod
+    def _generate(self, prompt):
+        """Respuesta completa del modelo a `prompt`."""
+
+    def _generate_stream(self, prompt):
+        yield self._generate(prompt)
+
+    def _call(self, prompt):
+        with self._slots:
+            return self._generate(prompt)
+
+    def generate(self, prompt):
+        """Respuesta completa del modelo, sin espacios alrededor."""
+        if not self.timeout_in_thread:
+            return self._call(prompt)
+        return self._wait([self._executor().submit(self._call, prompt)])[0]
+
+    def generate_stream(self, prompt):
+        """Genera los fragmentos de la respuesta según llegan; ocupa un hueco hasta terminar."""
+        with self._slots:
+            yield from self._generate_stream(prompt)
+
+    def generate_many(self, prompts):
+        """
+        Responde varios prompts independientes en paralelo (hasta
+        `concurrency` a la vez) y devuelve las respuestas en el mismo orden.
+        Lanza `TimeoutError` si el lote no ha terminado en `timeout` segundos.
+        """
+        prompts = list(prompts)
+        if not prompts:
+            return []
+        return self._wait([self._executor().submit(self._call, prompt) for prompt in prompts])
+
+    def _wait(self, futures):
+        """Resultados de `futures` en orden; un único plazo para todas, no uno por respuesta."""
+        try:
+            _, pending = wait(futures, timeout=self.timeout)
+            if pending:
+                raise TimeoutError(f"{len(pending)} of {len(futures)} LLM calls did not finish in {self.timeout} s")
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="llm")
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+@register_backend("ollama")
+class OllamaBackend(LLMBackend):
+    """Modelo local servido por Ollama (`OLLAMA_HOST`), con un cliente HTTP persistente."""
+
+    def __init__(self, model_id=OLLAMA_MODEL, host=None, timeout=None, concurrency=None):
+        import ollama
+
+        super().__init__(timeout, concurrency)
+        self.model_id = model_id
+        # Un único cliente: httpx mantiene abiertas las conexiones con el servidor
+        self._client = ollama.Client(host=host, timeout=self.timeout)
+
+    def _generate(self, prompt):
+        return self._client.chat(
+            model=self.model_id,
+            messages=[{"role": "user", "content": prompt}]
+        )["message"]["content"].strip()
+
+    def _generate_stream(self, prompt):
+        for chunk in self._client.chat(
+            model=self.model_id,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        ):
+            yield chunk["message"]["content"]
+
+
+@register_backend("watsonx")
+class WatsonxBackend(LLMBackend):
+    """
+    Modelo de IBM watsonx.ai; las credenciales se leen de PROJECT_ID,
+    IBM_API_KEY e IBM_WATSON_URL. El SDK gestiona su propia sesión HTTP,
+    que se reutiliza porque el `Model` se crea una sola vez. Como no admite
+    un plazo por llamada, `generate` espera la respuesta en un hilo como
+    mucho `timeout` segundos (el hilo de una llamada colgada sigue ocupando
+    su hueco hasta que el SDK vuelve).
+    """
+
+    timeout_in_thread = True
+
+    def __init__(self, model_id=WATSONX_MODEL, parameters=None, timeout=None, concurrency=None):
+        from ibm_watson_machine_learning.foundation_models import Model
+
+        super().__init__(timeout, concurrency)
+        credentials = {
+            "apikey": os.environ["IBM_API_KEY"],
+            "url": os.environ["IBM_WATSON_URL"]
+        }
+        self.model_id = model_id
+        self._model = Model(model_id, credentials, parameters or WATSONX_PARAMETERS, os.environ["PROJECT_ID"])
+
+    def _generate(self, prompt):
+        response = self._model.generate(prompt)
+        return response["results"][0]["generated_text"].strip()
+
+    def _generate_stream(self, prompt):
+        yield from self._model.generate_text_stream(prompt)
+
+
+@register_backend("stub")
+class StubBackend(LLMBackend):
+    """
+    Backend sin red para pruebas: la respuesta depende sólo del prompt
+    (sha256) y llega tras `latency` segundos, con `token_delay` entre
+    fragmentos en streaming.
+    """
+
+    def __init__(self, model_id="stub", latency=STUB_LATENCY, token_delay=STUB_TOKEN_DELAY,
+                 n_words=12, timeout=None, concurrency=None):
+        super().__init__(timeout, concurrency)
+        self.model_id = model_id
+        self.latency = latency
+        self.token_delay = token_delay
+        self.n_words = n_words
+
+    def words(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return [STUB_WORDS[digest[i] % len(STUB_WORDS)] for i in range(self.n_words)]
+
+    def _generate(self, prompt):
+        time.sleep(self.latency)
+        return " ".join(self.words(prompt))
+
+    def _generate_stream(self, prompt):
+        time.sleep(self.latency)
+        words = self.words(prompt)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
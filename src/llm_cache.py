@@ -0,0 +1,176 @@
+"""
+Caché persistente de respuestas del LLM.
+
+Las respuestas se guardan en SQLite con clave sha256(modelo + prompt
+normalizado), así que la misma pregunta con otra capitalización o con
+espacios distintos no vuelve a llamar al modelo. Las entradas caducan tras
+`ttl` segundos y, si se supera `max_entries`, se eliminan las usadas hace
+más tiempo (LRU).
+
+Opcionalmente (`similarity_threshold`) se aceptan preguntas casi iguales:
+se compara el texto del usuario por trigramas de caracteres (Jaccard) con
+las entradas del mismo modelo y tipo de prompt. Nunca se reutiliza una
+respuesta si los números de la pregunta no coinciden exactamente, para no
+confundir, por ejemplo, la descarga 57546 con la 57547.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+CACHE_FILE = "../data/cache/llm_cache.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+# None desactiva la búsqueda de preguntas casi iguales
+SIMILARITY_THRESHOLD = None
+
+def normalize_prompt(prompt):
+    """Pasa a minúsculas y colapsa los espacios."""
+    return " ".join(prompt.casefold().split())
+
+def normalize_user_input(user_input):
+    """Normalización más agresiva para comparar preguntas: sin signos de puntuación."""
+    return " ".join(re.sub(r"[^\w\s]", " ", user_input.casefold()).split())
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(a, b):
+    """Índice de Jaccard entre los trigramas de dos textos normalizados."""
+    trigrams_a, trigrams_b = trigrams(a), trigrams(b)
+    if not trigrams_a or not trigrams_b:
+        return 0.0
+    return len(trigrams_a & trigrams_b) / len(trigrams_a | trigrams_b)
+
+
+class LLMCache:
+    """Caché de respuestas del LLM con TTL, límite LRU y contadores de aciertos."""
+
+    def __init__(self, path=CACHE_FILE, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 similarity_threshold=SIMILARITY_THRESHOLD):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    kind TEXT,
+                    user_input TEXT,
+                    response TEXT,
+                    created REAL,
+                    last_used REAL
+                )""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_entries_kind ON entries (model, kind)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+        return self._connection
+
+    @staticmethod
+    def key(model_id, prompt):
+        return hashlib.sha256(f"{model_id}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def get(self, model_id, prompt, user_input=None, kind=None):
+        """Devuelve la respuesta guardada para el prompt (o una pregunta casi igual), o None."""
+        now = time.time()
+        with self._lock:
+            con = self._connect()
+            key = self.key(model_id, prompt)
+            row = con.execute("SELECT response FROM entries WHERE key = ? AND created >= ?",
+                              (key, now - self.ttl)).fetchone()
+            if row is None and self.similarity_threshold and user_input and kind:
+                key, row = self._find_similar(con, model_id, kind, user_input, now)
+                if row is not None:
+                    self.fuzzy_hits += 1
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            con.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            con.commit()
+            self.hits += 1
+            return row[0]
+
+    def _find_similar(self, con, model_id, kind, user_input, now):
+        normalized = normalize_user_input(user_input)
+        numbers = re.findall(r"\d+", normalized)
+        best_key, best_row, best_score = None, None, self.similarity_threshold
+
+        rows = con.execute("SELECT key, user_input, response FROM entries "
+                           "WHERE model = ? AND kind = ? AND created >= ?", (model_id, kind, now - self.ttl))
+        for key, cached_input, response in rows:
+            if cached_input is None or re.findall(r"\d+", cached_input) != numbers:
+                continue
+            score = similarity(normalized, cached_input)
+            if score >= best_score:
+                best_key, best_row, best_score = key, (response,), score
+        return best_key, best_row
+
+    def put(self, model_id, prompt, response, user_input=None, kind=None):
+        """Guarda una respuesta y aplica la caducidad y el límite de tamaño."""
+        now = time.time()
+        normalized_input = normalize_user_input(user_input) if user_input else None
+        with self._lock:
+            con = self._connect()
+            con.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (self.key(model_id, prompt), model_id, kind, normalized_input, response, now, now))
+            con.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+            con.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                        "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            con.commit()
+
+    def cached_call(self, model_id, prompt, generate, user_input=None, kind=None):
+        """Devuelve la respuesta en caché o llama a `generate(prompt)` y la guarda."""
+        response = self.get(model_id, prompt, user_input, kind)
+        if response is None:
+            response = generate(prompt)
+            self.put(model_id, prompt, response, user_input, kind)
+        return response
+
+    def cached_stream(self, model_id, prompt, generate_stream, user_input=None, kind=None):
+        """
+        Versión en streaming de `cached_call`: genera los fragmentos de
+        `generate_stream(prompt)` según llegan y guarda la respuesta completa
+        al terminar. Una respuesta en caché se emite de una vez.
+        """
+        response = self.get(model_id, prompt, user_input, kind)
+        if response is not None:
+            yield response
+            return
+
+        chunks = []
+        for chunk in generate_stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self.put(model_id, prompt, "".join(chunks).strip(), user_input, kind)
+
+    def stats(self):
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM entries")
+            self._connection.commit()
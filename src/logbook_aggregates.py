@@ -0,0 +1,419 @@
+"""
+Agregados materializados del cuaderno de descargas.
+
+Al cargar el CSV se calculan de una pasada los datos que piden las
+preguntas más frecuentes: número de descargas por año, mes, día y
+configuración, mínimo, máximo y último valor (el de la descarga más alta)
+de cada columna numérica, e índice shot → filas. `answer(sql)` responde
+desde ahí las consultas que genera el prompt de `query_csv` para esos casos
+(`SELECT COUNT(*) FROM data WHERE substr(fecha, 1, 4) = '2024'`,
+`SELECT MAX(CAST(col AS INTEGER)) FROM data`, `GROUP BY configuracion`...)
+y devuelve None para el resto, que siguen yendo a SQLite.
+
+Cuando cambia la fecha de modificación del CSV, `refresh()` sólo lee las
+filas añadidas al final si el principio del fichero no ha cambiado; en otro
+caso recalcula todo. Una última fila sin salto de línea se cuenta si el
+fichero no ha cambiado mientras se leía, pero no avanza la posición de
+lectura: se descuenta y se vuelve a leer en la siguiente actualización.
+"""
+import csv
+import hashlib
+import io
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+CSV_FILE = "../data/processed/cleaned_csv_data.csv"
+# Columnas que se mantienen como texto aunque parezcan números (como en logbook_db)
+TEXT_COLUMNS = {"fecha", "hora", "validada"}
+SHOT_COLUMN = "n_descarga"
+DATE_COLUMN = "fecha"
+CONFIGURATION_COLUMN = "configuracion"
+# Valores que pandas lee como nulos
+NULL_VALUES = {"", "nan", "NaN", "NA", "N/A", "n/a", "NULL", "null", "None", "<NA>", "-nan", "#N/A"}
+# substr(fecha, 1, N) → agrupación
+DATE_PREFIXES = {4: "year", 7: "month", 10: "day"}
+
+QUOTED = r"""['"]([^'"]*)['"]"""
+SELECT_PATTERN = re.compile(r"^select\s+(?P<expr>.+?)\s+from\s+data"
+                            r"(?:\s+where\s+(?P<where>.+?))?"
+                            r"(?:\s+group\s+by\s+(?P<group>.+?))?"
+                            r"(?:\s+order\s+by\s+(?P<order>.+?))?"
+                            r"(?:\s+limit\s+(?P<limit>\d+))?$", re.IGNORECASE)
+COUNT_PATTERN = re.compile(r"^count\(\s*\*\s*\)$", re.IGNORECASE)
+EXTREME_PATTERN = re.compile(r"^(max|min)\(\s*(?:cast\(\s*(\w+)\s+as\s+(integer|real|float)\s*\)|(\w+))\s*\)$",
+                             re.IGNORECASE)
+DATE_PREFIX_PATTERN = re.compile(r"^substr\(\s*fecha\s*,\s*1\s*,\s*(\d+)\s*\)$", re.IGNORECASE)
+CONDITION_PATTERNS = [
+    (re.compile(r"^substr\(\s*fecha\s*,\s*1\s*,\s*(\d+)\s*\)\s*=\s*" + QUOTED + "$", re.IGNORECASE), "date"),
+    (re.compile(r"^fecha\s*=\s*" + QUOTED + "$", re.IGNORECASE), "day"),
+    (re.compile(r"^configuracion\s*=\s*" + QUOTED + "$", re.IGNORECASE), "configuration"),
+    (re.compile(r"^n_descarga\s*=\s*['\"]?(\d+)['\"]?$", re.IGNORECASE), "shot"),
+]
+LAST_ORDER_PATTERN = re.compile(r"^n_descarga\s+desc$", re.IGNORECASE)
+
+def parse_number(text):
+    """float del texto, o None si no es un número (como `pd.to_numeric`, sin aceptar '1_000')."""
+    if "_" in text:
+        return None
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return None if math.isnan(value) else value
+
+def split_expressions(expr):
+    """Separa la lista del SELECT por las comas que no están dentro de paréntesis."""
+    parts, depth, current = [], 0, ""
+    for char in expr:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    parts.append(current.strip())
+    return parts
+
+def file_prefix_hash(path, size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+class LogbookAggregates:
+    """Recuentos, extremos e índice de shots del CSV, actualizados de forma incremental."""
+
+    def __init__(self, csv_file=CSV_FILE):
+        self.csv_file = csv_file
+        self._lock = threading.Lock()
+        self._signature = None
+        self.full_refreshes = 0
+        self.incremental_refreshes = 0
+        self.answered = 0
+        self._reset()
+
+    def _reset(self):
+        self.columns = []
+        self.rows = 0
+        self.by_year = Counter()
+        self.by_month = Counter()
+        self.by_day = Counter()
+        self.by_configuration = Counter()
+        # columna → [mínimo, máximo, entero]; se descarta si aparece un valor no numérico
+        self.numeric = {}
+        self.non_numeric = set(TEXT_COLUMNS)
+        self.date_range = [None, None]
+        self.last_row = None
+        self.last_shot = None
+        self.shot_index = {}
+        self.offset = 0
+        self.prefix_hash = None
+        self._digest = hashlib.sha256()
+        # Última fila sin "\n" y lo necesario para descontarla
+        self._tail = None
+
+    # ------------------------------------------------------------------ carga
+
+    def refresh(self):
+        """Actualiza los agregados si el CSV ha cambiado; True si había algo que leer."""
+        with self._lock:
+            stat = os.stat(self.csv_file)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature == self._signature:
+                return False
+            if self._tail is not None:
+                self._remove_tail()
+
+            appended = (self.prefix_hash is not None and stat.st_size >= self.offset
+                        and file_prefix_hash(self.csv_file, self.offset) == self.prefix_hash)
+            if appended:
+                self.incremental_refreshes += 1
+            else:
+                self._reset()
+                self.full_refreshes += 1
+            self._read_from(self.offset, signature)
+            self._signature = signature
+            return True
+
+    def _read_from(self, offset, signature):
+        with open(self.csv_file, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if offset == 0 and end == 0:
+            return
+        if end:
+            reader = csv.reader(io.StringIO(data[:end].decode("utf-8")))
+            if offset == 0:
+                self.columns = [column.strip().lower() for column in next(reader)]
+            for values in reader:
+                if values:
+                    self._add_row(values)
+
+            # Hash de todo lo leído: permite comprobar después que sólo se han añadido filas
+            self._digest.update(data[:end])
+            self.prefix_hash = self._digest.hexdigest()
+            self.offset = offset + end
+
+        # La última línea sin "\n" es una fila (como para pandas) si nadie está escribiendo
+        tail = data[end:]
+        if tail.strip() and self._unchanged(signature, offset + len(data)):
+            try:
+                values = next(csv.reader(io.StringIO(tail.decode("utf-8"))), None)
+            except UnicodeDecodeError:
+                return
+            if values:
+                self._add_tail(values)
+
+    def _unchanged(self, signature, size):
+        stat = os.stat(self.csv_file)
+        return (stat.st_size, stat.st_mtime_ns) == signature and stat.st_size == size
+
+    def _add_tail(self, values):
+        saved = (self.rows, list(self.date_range), self.last_row, self.last_shot,
+                 {column: list(stats) for column, stats in self.numeric.items()}, set(self.non_numeric))
+        shot = self._add_row(values)
+        self._tail = (values, shot, saved)
+
+    def _remove_tail(self):
+        """Deshace `_add_tail`: la fila se vuelve a leer desde `offset`."""
+        values, shot, saved = self._tail
+        self._tail = None
+        for counter, key in self._group_keys(dict(zip(self.columns, values))):
+            counter[key] -= 1
+            if not counter[key]:
+                del counter[key]
+        if shot is not None:
+            self.shot_index[shot].pop()
+            if not self.shot_index[shot]:
+                del self.shot_index[shot]
+        self.rows, self.date_range, self.last_row, self.last_shot, self.numeric, self.non_numeric = saved
+
+    def _group_keys(self, row):
+        """(contador, clave) de los recuentos en los que entra una fila."""
+        keys = []
+        date = row.get(DATE_COLUMN)
+        if date is not None:
+            # GROUP BY de SQLite cuenta las filas sin fecha en un grupo NULL
+            valid = date not in NULL_VALUES
+            keys += [(self.by_year, date[:4] if valid else None), (self.by_month, date[:7] if valid else None),
+                     (self.by_day, date if valid else None)]
+        configuration = row.get(CONFIGURATION_COLUMN)
+        if configuration is not None:
+            keys.append((self.by_configuration, None if configuration in NULL_VALUES else configuration))
+        return keys
+
+    def _add_row(self, values):
+        """Suma la fila a los agregados; devuelve su shot (o None)."""
+        row_number = self.rows
+        self.rows += 1
+        row = dict(zip(self.columns, values))
+
+        for counter, key in self._group_keys(row):
+            counter[key] += 1
+        date = row.get(DATE_COLUMN)
+        if date is not None and date not in NULL_VALUES:
+            if self.date_range[0] is None or date < self.date_range[0]:
+                self.date_range[0] = date
+            if self.date_range[1] is None or date > self.date_range[1]:
+                self.date_range[1] = date
+
+        parsed = {}
+        for column, text in row.items():
+            if text in NULL_VALUES:
+                parsed[column] = None
+                continue
+            if column in self.non_numeric:
+                parsed[column] = text
+                continue
+            value = parse_number(text)
+            if value is None:
+                self.non_numeric.add(column)
+                self.numeric.pop(column, None)
+                parsed[column] = text
+                continue
+            parsed[column] = value
+            stats = self.numeric.get(column)
+            if stats is None:
+                self.numeric[column] = [value, value, value.is_integer()]
+            else:
+                stats[0] = min(stats[0], value)
+                stats[1] = max(stats[1], value)
+                stats[2] = stats[2] and value.is_integer()
+
+        shot = parsed.get(SHOT_COLUMN)
+        if not isinstance(shot, float):
+            return None
+        shot = int(shot)
+        self.shot_index.setdefault(shot, []).append(row_number)
+        if self.last_shot is None or shot >= self.last_shot:
+            self.last_shot = shot
+            self.last_row = parsed
+        return shot
+
+    # -------------------------------------------------------------- consultas
+
+    def _typed(self, column, value):
+        if value is None or column not in self.numeric:
+            return value
+        return int(value) if self.numeric[column][2] else value
+
+    def extreme(self, function, column, cast=None):
+        """MAX/MIN de una columna numérica (o de `fecha`) como lo calcularía SQLite."""
+        if column == DATE_COLUMN:
+            return self.date_range[1 if function == "max" else 0]
+        if column not in self.numeric:
+            raise KeyError(column)
+        value = self.numeric[column][1 if function == "max" else 0]
+        if cast == "integer":
+            return int(value)
+        if cast in ("real", "float"):
+            return float(value)
+        return self._typed(column, value)
+
+    def count(self, kind=None, value=None):
+        """Número de filas, en total o para un año/mes/día, configuración o shot."""
+        if kind is None:
+            return self.rows
+        if kind == "year":
+            return self.by_year.get(value, 0)
+        if kind == "month":
+            return self.by_month.get(value, 0)
+        if kind == "day":
+            return self.by_day.get(value, 0)
+        if kind == "configuration":
+            return self.by_configuration.get(value, 0)
+        return len(self.shot_index.get(int(value), ()))
+
+    def last(self, column):
+        """Valor de la columna en la descarga con el número más alto."""
+        if self.last_row is None:
+            return None
+        return self._typed(column, self.last_row.get(column))
+
+    def groups(self, kind):
+        """[(clave, recuento)] ordenado como el GROUP BY de SQLite (NULL primero)."""
+        counter = {"year": self.by_year, "month": self.by_month, "day": self.by_day,
+                   "configuration": self.by_configuration}[kind]
+        return sorted(counter.items(), key=lambda item: (item[0] is not None, item[0] or ""))
+
+    def _condition(self, where):
+        """(tipo, valor) de una condición WHERE soportada, o None."""
+        for pattern, kind in CONDITION_PATTERNS:
+            match = pattern.match(where)
+            if not match:
+                continue
+            if kind == "date":
+                length = int(match.group(1))
+                if length not in DATE_PREFIXES:
+                    return None
+                return DATE_PREFIXES[length], match.group(2)
+            return kind, match.group(1)
+        return None
+
+    def answer(self, sql_query):
+        """
+        Resultado de la consulta como (columnas, filas) si se puede responder
+        con los agregados, o None. Las columnas llevan el mismo nombre que
+        daría SQLite (la expresión tal como está escrita).
+        """
+        sql = " ".join(sql_query.strip().rstrip(";").split())
+        match = SELECT_PATTERN.match(sql)
+        if not match:
+            return None
+        expr, where, group, order, limit = (match.group(name) for name in ("expr", "where", "group", "order", "limit"))
+        with self._lock:
+            try:
+                result = self._answer(expr, where, group, order, limit)
+            except (KeyError, ValueError):
+                return None
+            if result is not None:
+                self.answered += 1
+            return result
+
+    def _answer(self, expr, where, group, order, limit):
+        if group:
+            return self._answer_group(expr, group, where, order, limit)
+        if limit is not None and int(limit) == 0:
+            return None
+
+        condition = self._condition(where) if where else None
+        if where and condition is None:
+            return None
+
+        if COUNT_PATTERN.match(expr) and not order:
+            if condition is None:
+                return [expr], [(self.count(),)]
+            return [expr], [(self.count(*condition),)]
+
+        # Un shot que no está en el índice no necesita consulta: resultado vacío
+        if condition and condition[0] == "shot" and int(condition[1]) not in self.shot_index:
+            columns = self.columns if expr == "*" else split_expressions(expr)
+            if all(column.lower() in self.columns for column in columns):
+                return columns, []
+            return None
+
+        extreme = EXTREME_PATTERN.match(expr)
+        if extreme and where is None and not order:
+            function, cast_column, cast, column = extreme.groups()
+            return [expr], [(self.extreme(function.lower(), (cast_column or column).lower(),
+                                          cast.lower() if cast else None),)]
+
+        # Valores de la última descarga: SELECT col FROM data ORDER BY n_descarga DESC LIMIT 1
+        if where is None and order and limit == "1" and LAST_ORDER_PATTERN.match(order):
+            columns = self.columns if expr == "*" else [column.lower() for column in split_expressions(expr)]
+            if any(column not in self.columns for column in columns):
+                return None
+            if self.last_row is None:
+                return columns, []
+            return columns, [tuple(self.last(column) for column in columns)]
+        return None
+
+    def _answer_group(self, expr, group, where, order, limit):
+        if where or order or limit:
+            return None
+        parts = split_expressions(expr)
+        if len(parts) != 2 or not COUNT_PATTERN.match(parts[1]):
+            return None
+        key = parts[0]
+        if " ".join(group.split()).lower() != " ".join(key.split()).lower():
+            return None
+
+        date_prefix = DATE_PREFIX_PATTERN.match(key)
+        if date_prefix:
+            kind = DATE_PREFIXES.get(int(date_prefix.group(1)))
+        elif key.lower() == DATE_COLUMN:
+            kind = "day"
+        elif key.lower() == CONFIGURATION_COLUMN:
+            kind = "configuration"
+        else:
+            return None
+        if kind is None:
+            return None
+        return parts, self.groups(kind)
+
+    def shot_rows(self, shot):
+        """Números de fila (desde 0, en el orden del CSV) de un shot."""
+        with self._lock:
+            return list(self.shot_index.get(int(shot), ()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows": self.rows,
+                "shots": len(self.shot_index),
+                "numeric_columns": len(self.numeric),
+                "full_refreshes": self.full_refreshes,
+                "incremental_refreshes": self.incremental_refreshes,
+                "answered": self.answered,
+            }
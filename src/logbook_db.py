@@ -0,0 +1,314 @@
+"""
+Base de datos SQLite persistente con el cuaderno de descargas del TJ-II.
+
+El CSV limpio se carga una sola vez en `DB_FILE`, con columnas numéricas de
+verdad (INTEGER/REAL) en lugar de texto e índices sobre `n_descarga`,
+`fecha` y `configuracion` (más índices de expresión sobre el año y el mes
+de `fecha`, que son los que genera el prompt de `query_csv`). Las consultas
+se ejecutan siempre sobre la misma conexión de solo lectura. Cuando cambia
+el CSV, si sólo se han añadido filas al final (el hash del principio del
+fichero coincide con el guardado en `meta`) y sus valores encajan en los
+tipos de las columnas, se insertan esas filas; en otro caso la base de datos
+se reconstruye entera.
+
+Si existe la base de datos de resultados de `mhd_scan`, se adjunta a la
+conexión y su tabla `mhd` (shot, mhd, probability...) se puede cruzar con
+`data` en la misma consulta.
+
+Las consultas frecuentes (recuentos por fecha o configuración, máximos y
+mínimos, valores de la última descarga...) se responden antes desde los
+agregados de `logbook_aggregates`, que se actualizan con el CSV.
+
+`get_logbook()` devuelve la instancia compartida por `main` y los parsers;
+pandas sólo se importa al reconstruir la base de datos o al consultar.
+"""
+import csv
+import io
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+
+from logbook_aggregates import LogbookAggregates, file_prefix_hash
+
+CSV_FILE = "../data/processed/cleaned_csv_data.csv"
+DB_FILE = "../data/processed/logbook.sqlite"
+TABLE_NAME = "data"
+RESULTS_DB = "../data/processed/mhd_results.sqlite"
+RESULTS_TABLE = "mhd"
+
+# Columnas que se mantienen como texto aunque parezcan números
+TEXT_COLUMNS = {"fecha", "hora", "validada"}
+# nombre del índice: (columna necesaria, expresión indexada)
+INDEXES = {
+    "idx_n_descarga": ("n_descarga", "n_descarga"),
+    "idx_fecha": ("fecha", "fecha"),
+    "idx_configuracion": ("configuracion", "configuracion"),
+    "idx_fecha_year": ("fecha", "substr(fecha, 1, 4)"),
+    "idx_fecha_month": ("fecha", "substr(fecha, 1, 7)"),
+}
+
+def load_logbook_dataframe(csv_file=CSV_FILE):
+    """Lee el CSV, normaliza los nombres de columna y convierte a número las columnas numéricas."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_file, dtype={column: "string" for column in TEXT_COLUMNS}, low_memory=False)
+    df.columns = df.columns.str.strip().str.lower()
+
+    for column in df.columns:
+        if column in TEXT_COLUMNS or pd.api.types.is_numeric_dtype(df[column]):
+            continue
+        converted = pd.to_numeric(df[column], errors="coerce")
+        if converted.notna().sum() == df[column].notna().sum():
+            df[column] = converted
+
+    for column in df.select_dtypes(include="float").columns:
+        values = df[column].dropna()
+        if len(values) and (values == values.round()).all():
+            df[column] = df[column].astype("Int64")
+
+    return df
+
+def csv_signature(csv_file):
+    stat = os.stat(csv_file)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def csv_position(csv_file):
+    """
+    (tamaño, hash) del CSV para añadir después sólo las filas nuevas, o
+    (None, None) si no acaba en salto de línea: la siguiente fila
+    continuaría la última y hay que reconstruir.
+    """
+    size = os.path.getsize(csv_file)
+    with open(csv_file, "rb") as f:
+        f.seek(max(size - 1, 0))
+        if f.read(1) != b"\n":
+            return None, None
+    return size, file_prefix_hash(csv_file, size)
+
+def build_database(csv_file=CSV_FILE, db_file=DB_FILE):
+    """Crea (o recrea) la base de datos SQLite a partir del CSV."""
+    signature = csv_signature(csv_file)
+    offset, prefix_hash = csv_position(csv_file)
+    df = load_logbook_dataframe(csv_file)
+    if csv_signature(csv_file) != signature:
+        # El CSV ha cambiado mientras se leía: no se sabe qué filas hay en la base de datos
+        offset = prefix_hash = None
+
+    tmp_file = f"{db_file}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+    with sqlite3.connect(tmp_file) as con:
+        df.to_sql(TABLE_NAME, con, index=False)
+        for name, (column, expression) in INDEXES.items():
+            if column in df.columns:
+                con.execute(f"CREATE INDEX {name} ON {TABLE_NAME} ({expression})")
+        con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        con.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("csv_signature", signature), ("csv_offset", offset), ("csv_prefix_hash", prefix_hash)])
+        con.execute("ANALYZE")
+    con.close()
+
+    os.replace(tmp_file, db_file)
+
+def _appended_rows(csv_file, columns, types, data):
+    """
+    Filas de `data` (líneas del CSV sin cabecera) listas para insertar, o
+    None si algún valor no cabe en el tipo de su columna: la reconstrucción
+    cambiaría el tipo (un decimal en una columna INTEGER, texto en una
+    numérica...) y el resultado no sería el mismo.
+    """
+    import pandas as pd
+
+    with open(csv_file, "rb") as f:
+        header = f.readline()
+    if [column.strip().lower() for column in next(csv.reader([header.decode("utf-8")]))] != columns:
+        return None
+
+    text_columns = [column for column in columns if types[column] == "TEXT"]
+    df = pd.read_csv(io.BytesIO(header + data), dtype={column: "string" for column in text_columns},
+                     low_memory=False)
+    df.columns = columns
+    for column in columns:
+        values = df[column].dropna()
+        if types[column] == "TEXT" or values.empty:
+            continue
+        if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            return None
+        if types[column] == "INTEGER":
+            if not (values == values.round()).all():
+                return None
+            df[column] = df[column].astype("Int64")
+
+    df = df.astype(object).where(df.notna(), None)
+    return [tuple(value.item() if hasattr(value, "item") else value for value in row)
+            for row in df.itertuples(index=False, name=None)]
+
+def append_to_database(csv_file=CSV_FILE, db_file=DB_FILE):
+    """
+    Inserta en la base de datos las filas añadidas al final del CSV desde
+    que se construyó. Devuelve el número de filas insertadas, o None si hay
+    que reconstruirla (no existe, ha cambiado el principio del CSV o las
+    filas nuevas cambiarían el tipo de alguna columna).
+    """
+    if not os.path.exists(db_file):
+        return None
+    con = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        # Transacción de escritura: dos procesos no pueden insertar las mismas filas
+        con.execute("BEGIN IMMEDIATE")
+        meta = dict(con.execute("SELECT key, value FROM meta"))
+        if meta.get("csv_signature") == csv_signature(csv_file):
+            con.execute("ROLLBACK")
+            return 0
+        offset = meta.get("csv_offset")
+        if offset is None or os.path.getsize(csv_file) < int(offset):
+            con.execute("ROLLBACK")
+            return None
+        offset = int(offset)
+
+        signature = csv_signature(csv_file)
+        new_offset, new_hash = csv_position(csv_file)
+        if new_offset is None or file_prefix_hash(csv_file, offset) != meta.get("csv_prefix_hash"):
+            con.execute("ROLLBACK")
+            return None
+        with open(csv_file, "rb") as f:
+            f.seek(offset)
+            data = f.read(new_offset - offset)
+
+        info = con.execute(f"PRAGMA table_info({TABLE_NAME})").fetchall()
+        columns = [row[1] for row in info]
+        types = {row[1]: row[2] for row in info}
+        rows = _appended_rows(csv_file, columns, types, data) if data.strip() else []
+        if rows is None:
+            con.execute("ROLLBACK")
+            return None
+        # Una columna REAL sin ningún valor pasaría a INTEGER al reconstruir
+        for i, column in enumerate(columns):
+            if types[column] == "REAL" and any(row[i] is not None for row in rows):
+                if con.execute(f'SELECT COUNT("{column}") FROM {TABLE_NAME}').fetchone()[0] == 0:
+                    con.execute("ROLLBACK")
+                    return None
+
+        placeholders = ", ".join("?" * len(columns))
+        con.executemany(f"INSERT INTO {TABLE_NAME} VALUES ({placeholders})", rows)
+        if csv_signature(csv_file) != signature:
+            con.execute("ROLLBACK")
+            return None
+        con.executemany("UPDATE meta SET value = ? WHERE key = ?", [
+            (signature, "csv_signature"), (new_offset, "csv_offset"), (new_hash, "csv_prefix_hash")])
+        con.execute("COMMIT")
+        return len(rows)
+    except (sqlite3.Error, ValueError):
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        return None
+    finally:
+        con.close()
+
+def is_up_to_date(csv_file=CSV_FILE, db_file=DB_FILE):
+    """True si la base de datos existe y se construyó a partir de la versión actual del CSV."""
+    if not os.path.exists(db_file):
+        return False
+    try:
+        with sqlite3.connect(f"file:{db_file}?mode=ro", uri=True) as con:
+            row = con.execute("SELECT value FROM meta WHERE key = 'csv_signature'").fetchone()
+        con.close()
+    except sqlite3.Error:
+        return False
+    return row is not None and row[0] == csv_signature(csv_file)
+
+
+class LogbookDatabase:
+    """Acceso de solo lectura, con una conexión reutilizada, al cuaderno de descargas."""
+
+    def __init__(self, csv_file=CSV_FILE, db_file=DB_FILE, results_db=RESULTS_DB, aggregates=True):
+        self.csv_file = csv_file
+        self.db_file = db_file
+        self.results_db = results_db
+        self.aggregates = LogbookAggregates(csv_file) if aggregates else None
+        self._connection = None
+        self._signature = None
+        self._results_attached = False
+        self.rebuilds = 0
+        self.appended_rows = 0
+        self._lock = threading.Lock()
+
+    def _attach_results(self):
+        """Adjunta (en solo lectura) la base de datos de resultados MHD en cuanto existe."""
+        if self._results_attached or not self.results_db or not os.path.exists(self.results_db):
+            return
+        uri = f"file:{os.path.abspath(self.results_db)}?mode=ro"
+        self._connection.execute("ATTACH DATABASE ? AS results", (uri,))
+        self._results_attached = True
+
+    def _connect(self):
+        """Abre la conexión, reconstruyendo antes la base de datos si el CSV ha cambiado."""
+        signature = csv_signature(self.csv_file)
+        if self._connection is not None and signature == self._signature:
+            self._attach_results()
+            return self._connection
+
+        if not is_up_to_date(self.csv_file, self.db_file):
+            appended = append_to_database(self.csv_file, self.db_file)
+            if appended is None:
+                build_database(self.csv_file, self.db_file)
+                self.rebuilds += 1
+            else:
+                self.appended_rows += appended
+
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+        self._signature = signature
+        if self.aggregates is not None:
+            self.aggregates.refresh()
+        self._results_attached = False
+        self._attach_results()
+        return self._connection
+
+    def available(self):
+        """True si existe el CSV del cuaderno (la base de datos se crea en la primera consulta)."""
+        return os.path.exists(self.csv_file)
+
+    def columns(self):
+        """Nombres de las columnas de la tabla `data`."""
+        with self._lock:
+            cursor = self._connect().execute(f"SELECT * FROM {TABLE_NAME} LIMIT 0")
+            return [description[0] for description in cursor.description]
+
+    def has_results(self):
+        """True si la tabla `mhd` de resultados está disponible para las consultas."""
+        with self._lock:
+            self._connect()
+            return self._results_attached
+
+    def query(self, sql_query):
+        """
+        Ejecuta una consulta SQL y devuelve el resultado como DataFrame; si
+        la consulta se puede responder con los agregados no llega a SQLite.
+        """
+        import pandas as pd
+
+        with self._lock:
+            connection = self._connect()
+            if self.aggregates is not None:
+                answer = self.aggregates.answer(sql_query)
+                if answer is not None:
+                    columns, rows = answer
+                    return pd.DataFrame(rows, columns=columns)
+            return pd.read_sql_query(sql_query, connection)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                self._results_attached = False
+
+
+@lru_cache(maxsize=None)
+def get_logbook(csv_file=CSV_FILE, db_file=DB_FILE, results_db=RESULTS_DB):
+    """Instancia compartida de `LogbookDatabase`: el cuaderno se carga una sola vez por proceso."""
+    return LogbookDatabase(csv_file, db_file, results_db)
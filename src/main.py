@@ -1,146 +1,256 @@
-import gradio as gr
-import urllib3
-import pandas as pd
-#import requests
-import subprocess
-import sys
+import argparse
+import asyncio
 import os
-import certifi
+import sys
+import threading
+import time
+#import requests
 #import io
-from ai_parser import parse_user_input_with_ai, determine_intent, ask_general_ai, clean_answer, parse_user_input_for_shot_number, query_csv
-from data_fetcher import generate_url, fetch_data, extract_data_points
-from plotter import plot_data_per_signal
-from config_loader import load_keywords, load_signal_options
+from startup_profile import StartupProfile
+
+# Se crea antes del resto de imports para poder medirlos con --startup-profile
+profile = StartupProfile(enabled=__name__ == "__main__" and "--startup-profile" in sys.argv)
+
+with profile.phase("imports"):
+    import urllib3
+    import certifi
+    from ai_parser import parse_user_input_with_ai, determine_intent, guess_intent, ask_general_ai, parse_user_input_for_shot_number, query_csv
+    from fetch_engine import FetchEngine, FetchJob
+    from logbook_db import get_logbook
+    from request_pipeline import RequestPipeline, PipelineBusy, predict_with_image, plot_groups, render_group, MAX_ACTIVE_REQUESTS, MAX_PENDING_REQUESTS
+    from response_templates import detect_language
+    from signal_cache import SignalCache
+    from signal_registry import get_registry
 
 # ---------------------- CONFIGURATION ---------------------- #
 os.environ["SSL_CERT_FILE"] = certifi.where()
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-BASE_URL = "https://info.fusion.ciemat.es/cgi-bin/TJII_data.cgi"
-CSV_FILE = "../data/processed/cleaned_csv_data.csv"
+BASE_URL = os.environ.get("TJII_BASE_URL", "https://info.fusion.ciemat.es/cgi-bin/TJII_data.cgi")
+# Adelanta la extracción y la descarga/predicción mientras se decide la intención
+SPECULATIVE = os.environ.get("SPECULATIVE_PIPELINE", "1") != "0"
+
+with profile.phase("shared state"):
+    # El cuaderno es el mismo objeto que usan los parsers y se carga en la primera consulta
+    logbook = get_logbook()
+    signal_registry = get_registry()
+    signal_cache = SignalCache()
+    fetch_engine = FetchEngine(BASE_URL, cache=signal_cache)
+    pipeline = RequestPipeline()
 
-def load_csv():
+# ------------------ END CONFIGURATION ---------------------- #
+
+
+async def stream_text(request, make_stream, images, empty_message="No response.", table=None):
+    """
+    Emite (texto acumulado, imágenes, tabla) a medida que llegan los
+    fragmentos de una respuesta en streaming. `make_stream` puede devolver
+    también una respuesta ya completa (texto o diccionario de error).
+    """
+    text = ""
+    start = time.perf_counter()
     try:
-        return pd.read_csv(CSV_FILE)
+        async for chunk in request.llm_stream(make_stream):
+            if isinstance(chunk, dict) or chunk is None:
+                yield chunk if chunk else empty_message, images, table
+                return
+            text += chunk
+            yield text, images, table
+    except (TimeoutError, PipelineBusy):
+        raise
     except Exception as e:
-        return f"Error loading CSV: {e}"
+        yield f"{text}\nError: {e}".strip(), images, table
+        return
+    finally:
+        request.stages["answer"] = time.perf_counter() - start
+    if not text.strip():
+        yield empty_message, images, table
 
-df = load_csv()
-keywords = load_keywords()
-valid_signals = load_signal_options()
+# ---------------------- MAIN RESPONSE ---------------------- #
+async def chatbot_response(user_input):
+    """
+    Determina la intención del usuario y ejecuta la acción correspondiente.
+    Es un generador asíncrono: Gradio muestra cada (texto, imágenes, tabla)
+    según se emite, de modo que gráficos y espectrogramas aparecen antes que
+    el texto del LLM, y las etapas lentas no bloquean a otros usuarios.
+    """
+    try:
+        async with pipeline.request() as request:
+            try:
+                async for response in _respond(request, user_input):
+                    yield response
+            finally:
+                print("Timings:", ", ".join(f"{name} {elapsed:.2f}s" for name, elapsed in request.report().items()))
+    except PipelineBusy as e:
+        yield str(e), [], None
+    except TimeoutError:
+        yield "Error: the request took too long and was cancelled.", [], None
 
-# ------------------ END CONFIGURATION ---------------------- #
+async def fetch_plot_data(request, user_input):
+    """
+    Extrae shots, ventana y señales de la pregunta y descarga los datos.
+    Devuelve (shots, resultados por shot) o (None, mensaje de error).
+    """
+    parsed_data = await request.stage("extract", request.llm(parse_user_input_with_ai, user_input))
+    if not parsed_data or "shot" not in parsed_data:
+        return None, "Failed to interpret request."
 
+    shot = parsed_data["shot"]
+    shots = shot if isinstance(shot, list) else [shot]
+    tstart = parsed_data.get("tstart", 0)
+    tstop = parsed_data.get("tstop", 2000)
+    signals = signal_registry.valid(parsed_data.get("signals", []))
+    if not signals:
+        return None, "No valid signals found."
 
-def run_prediction(shot_number, generate_if_missing="No"):
-    """Ejecuta `predict_spectogram.py`, captura su salida y devuelve mensaje e imágenes."""
-    try:
-        
-        result = subprocess.run(
-            [sys.executable, "predict_spectogram.py", str(shot_number), generate_if_missing],
-            capture_output=True, text=True
-        )
+    jobs = [FetchJob(s, signals, tstart, tstop) for s in shots]
+    return shots, await request.stage("fetch", request.network(fetch_engine.run, jobs))
 
-        output_lines = result.stdout.strip().split("\n")
-        if not output_lines:
-            return "Error: No output from prediction script.", None
-        
-        message = output_lines[0] 
+async def predict_shot(request, user_input):
+    """Extrae el número de descarga y predice MHD: (texto, imagen, ok)."""
+    shot_number = await request.stage("extract", request.llm(parse_user_input_for_shot_number, user_input))
+    return await request.stage("predict", request.cpu(predict_with_image, shot_number, "Yes", detect_language(user_input)))
 
-        if "ERROR" in message or "WARNING" in message:
-            return message, None
+async def plot_shot(request, data_points_dict, shot=None):
+    """
+    Decima y agrupa las señales en este proceso (en un hilo) y dibuja cada
+    grupo como una tarea del pool de CPU; devuelve las imágenes en orden.
+    """
+    groups = await asyncio.to_thread(plot_groups, data_points_dict, shot)
+    return list(await asyncio.gather(*(request.cpu(render_group, title, series) for title, series in groups)))
 
-        if "SUCCESS" in message:
-            primary_folder = "./spectograms/spectograms_for_try"
-            secondary_folder = "./spectograms/spectograms_for_ai_learning"
+# Trabajo previo a la respuesta de cada intención, que se puede adelantar
+INTENT_WORK = {"PLOT": fetch_plot_data, "PREDICT": predict_shot}
 
-            image_path = f"{primary_folder}/{shot_number}.png"
+def discard(task):
+    """Cancela una tarea especulativa que ya no hace falta sin dejar excepciones sin recoger."""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
-            if not os.path.exists(image_path):
-                image_path = f"{secondary_folder}/{shot_number}.png"
+async def plan_request(request, user_input, speculative=None):
+    """
+    Decide la intención y hace el trabajo previo de PLOT y PREDICT.
 
-                if not os.path.exists(image_path):
-                    return f"Error: Image for shot {shot_number} not found in both directories.", None
+    En modo especulativo, la extracción y la descarga (o la predicción) de
+    la intención más probable según las reglas arrancan a la vez que
+    `determine_intent`, así que cuando éste tiene que preguntar al LLM la
+    espera total es la del paso más lento y no la suma. Si la intención
+    final es otra, ese trabajo se cancela (una descarga ya en curso termina
+    igualmente en la caché de señales). Devuelve (intención, resultado del
+    trabajo previo o None).
+    """
+    speculative = SPECULATIVE if speculative is None else speculative
+    intent_task = asyncio.ensure_future(request.stage("intent", request.llm(determine_intent, user_input)))
+    guess = guess_intent(user_input) if speculative else None
+    ahead = asyncio.ensure_future(INTENT_WORK[guess](request, user_input)) if guess in INTENT_WORK else None
 
-            message = clean_answer(message)
-            return message, image_path
+    try:
+        intent = await intent_task
+    except BaseException:
+        if ahead is not None:
+            discard(ahead)
+        raise
 
-    except Exception as e:
-        return f"Error running prediction script: {e}", None
+    if ahead is not None and guess != intent:
+        discard(ahead)
+        ahead = None
+    if intent not in INTENT_WORK:
+        return intent, None
+    if ahead is None:
+        return intent, await INTENT_WORK[intent](request, user_input)
+    try:
+        return intent, await ahead
+    except asyncio.CancelledError:
+        discard(ahead)
+        raise
 
-# ---------------------- MAIN RESPONSE ---------------------- #
-def chatbot_response(user_input):
-    """Determina la intención del usuario y ejecuta la acción correspondiente."""
-    intent = determine_intent(user_input)
+async def _respond(request, user_input):
+    intent, prepared = await plan_request(request, user_input)
 
     if intent == "PLOT":
-        parsed_data = parse_user_input_with_ai(user_input)
-        if parsed_data and "shot" in parsed_data:
-            shot = parsed_data["shot"]
-            tstart = parsed_data.get("tstart", 0)
-            tstop = parsed_data.get("tstop", 2000)
-            signals = [sig for sig in parsed_data.get("signals", []) if sig in valid_signals]
-
-            if signals:
-                url = generate_url(BASE_URL, shot, len(signals), signals, ["1.00"] * len(signals), tstart, tstop)
-                html_content = fetch_data(url)
-
-                if html_content:
-                    data_points_dict = extract_data_points(html_content, signals)
-                    img_list = []
-
-                    for img_pil in plot_data_per_signal(data_points_dict): 
-                        img_list.append(img_pil)
-
-                    if img_list:
-                        return f"Plot generated for shot {shot}.", img_list
-                    else:
-                        return f"Error: No plots could be generated for {shot}.", []
-                else:
-                    return "No data retrieved.", []
+        shots, results = prepared
+        if shots is None:
+            yield results, [], None
+        elif any(results.values()):
+            shots_text = ", ".join(str(s) for s in shots)
+            # Los shots se muestran según terminan; cada grupo de señales es una tarea de CPU
+            # Con varios shots, la etapa "plot" guarda el gráfico más lento
+            tasks = [asyncio.ensure_future(request.stage("plot", plot_shot(request, results.get(s, {}), s if len(shots) > 1 else None),
+                                                         longest=True))
+                     for s in shots]
+            img_list = []
+            try:
+                for task in asyncio.as_completed(tasks):
+                    img_list.extend(await task)
+                    if len(shots) > 1:
+                        yield f"Plotting shots {shots_text}...", list(img_list), None
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            if img_list:
+                yield f"Plot generated for shot {shots_text}.", img_list, None
             else:
-                return "No valid signals found.", []
+                yield f"Error: No plots could be generated for {shots_text}.", [], None
         else:
-            return "Failed to interpret request.", []
+            yield "No data retrieved.", [], None
     elif intent == "CSV":
-        if isinstance(df, pd.DataFrame):
-            csv_response = query_csv(user_input)
-
-            if csv_response:
-                return csv_response, []
-            else:
-                return "No relevant data found in CSV.", []
+        if logbook.available():
+            # Las formas habituales de resultado llegan ya redactadas; sólo las raras pasan por el LLM
+            answer, table = await request.stage("sql", request.llm(query_csv, user_input, stream=True))
+            async for response in stream_text(request, lambda: answer, [], "No relevant data found in CSV.", table):
+                yield response
         else:
-            return "CSV data is not available.", []
+            yield "CSV data is not available.", [], None
 
     elif intent == "PREDICT":
-        shot_number = parse_user_input_for_shot_number(user_input)
-        generate_if_missing = "Yes"
-
-        result_text, img_path = run_prediction(shot_number, generate_if_missing)
-
-        if img_path:
-            return result_text, [img_path]
-        else:
-            return result_text, []
+        result_text, img_path, ok = prepared
+        # El texto ya viene redactado con la plantilla del idioma de la pregunta
+        yield result_text, [img_path] if img_path else [], None
 
     else:
-        response = ask_general_ai(user_input)
-        return response if response else "No response.", None
+        async for response in stream_text(request, lambda: ask_general_ai(user_input, stream=True), []):
+            yield response
     
 # ------------------ END MAIN RESPONSE ---------------------- #
 
 # ---------------------- GRADIO INTERFACE ---------------------- #
-interface = gr.Interface(
-    fn=chatbot_response,
-    inputs=gr.Textbox(label="Ask a question or request a plot:"),
-    outputs=[
-        gr.Textbox(label="Response / Prediction Result"),
-        gr.Gallery(label="Generated Images"),
-    ],
-    title="TJ-II Chatbot",
-    description="Chatbot para análisis de espectrogramas del TJ-II."
-)
+def build_interface():
+    """Crea la interfaz de Gradio (gradio se importa aquí y no al importar este módulo)."""
+    import gradio as gr
+
+    return gr.Interface(
+        fn=chatbot_response,
+        inputs=gr.Textbox(label="Ask a question or request a plot:"),
+        outputs=[
+            gr.Textbox(label="Response / Prediction Result"),
+            gr.Gallery(label="Generated Images"),
+            gr.DataFrame(label="Query Result"),
+        ],
+        title="TJ-II Chatbot",
+        description="Chatbot para análisis de espectrogramas del TJ-II."
+    )
+
+def warm_up():
+    """Carga en segundo plano lo que la primera petición necesitaría: procesos de CPU, modelo y cuaderno."""
+    pipeline.warm_up()
+    if logbook.available():
+        logbook.columns()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TJ-II chatbot")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print a startup timing breakdown (phases and slowest imports)")
+    parser.add_argument("--no-warm-up", action="store_true",
+                        help="Do not preload the plotting/prediction modules and the logbook in the background")
+    args = parser.parse_args()
+
+    with profile.phase("gradio interface"):
+        interface = build_interface()
+        interface.queue(default_concurrency_limit=MAX_ACTIVE_REQUESTS, max_size=MAX_PENDING_REQUESTS)
+
+    profile.stop()
+    profile.report()
+    if not args.no_warm_up:
+        threading.Thread(target=warm_up, daemon=True).start()
     interface.launch()
@@ -0,0 +1,172 @@
+"""
+Clasificación MHD de campañas completas.
+
+Toma un rango o una lista de shots, se queda con los que tienen fichero
+MIR5C, calcula espectrogramas y características HOG en un pool de procesos
+y clasifica cada lote con una única llamada al modelo sobre la matriz
+apilada. Los resultados se escriben lote a lote en `RESULTS_DB` (tabla
+`mhd`), así que un escaneo interrumpido continúa donde se quedó: sólo se
+recalculan los shots que faltan o los que se clasificaron con otro modelo.
+
+`logbook_db` adjunta esta base de datos, de modo que la tabla `mhd` se
+puede cruzar con el cuaderno de descargas desde `query_csv`.
+
+Uso:
+    python mhd_scan.py 56000-57999 --workers 4
+    python mhd_scan.py --all
+    python mhd_scan.py 56967 56968 --rescan
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+import numpy as np
+
+from logbook_db import RESULTS_DB, RESULTS_TABLE
+from predict_spectogram import MHDPredictor, model_path
+from raw_data import available_shots
+
+BATCH_SIZE = 256
+
+_worker_predictor = None
+
+def parse_shots(specs):
+    """Convierte argumentos como '56000-56100' o '56967' en una lista ordenada de shots."""
+    shots = set()
+    for spec in specs:
+        for part in str(spec).split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                first, last = (int(value) for value in part.split("-", 1))
+                shots.update(range(min(first, last), max(first, last) + 1))
+            else:
+                shots.add(int(part))
+    return sorted(shots)
+
+def model_signature(path=model_path):
+    """Identifica la versión del modelo (tamaño y fecha de modificación del .pkl)."""
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def connect_results(db_file=RESULTS_DB):
+    os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+    con = sqlite3.connect(db_file)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+            shot INTEGER PRIMARY KEY,
+            mhd INTEGER,
+            probability REAL,
+            error TEXT,
+            model TEXT,
+            feature_source TEXT,
+            scanned_at TEXT
+        )""")
+    con.execute(f"CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_mhd ON {RESULTS_TABLE} (mhd)")
+    return con
+
+def done_shots(con, signature):
+    """Shots ya clasificados sin error con el modelo actual."""
+    rows = con.execute(f"SELECT shot FROM {RESULTS_TABLE} WHERE model = ? AND error IS NULL", (signature,))
+    return {row[0] for row in rows}
+
+def write_results(con, results, signature, feature_source):
+    scanned_at = datetime.now().isoformat(timespec="seconds")
+    with con:
+        con.executemany(f"INSERT OR REPLACE INTO {RESULTS_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            (result["shot"], None if result["mhd"] is None else int(result["mhd"]), result["probability"],
+             result["error"], signature, feature_source, scanned_at)
+            for result in results
+        ])
+
+def _init_worker(feature_source):
+    global _worker_predictor
+    # Sólo calcula características: el modelo no se carga en los procesos auxiliares
+    _worker_predictor = MHDPredictor(feature_source=feature_source)
+
+def _shot_features(shot_number):
+    return _worker_predictor.features(shot_number, generate_if_missing=True)
+
+def scan(shot_numbers, workers=None, db_file=RESULTS_DB, batch_size=BATCH_SIZE, rescan=False):
+    """
+    Clasifica los shots que todavía no están en la base de datos de resultados.
+    Devuelve un resumen con el número de shots clasificados, con MHD y con error.
+    """
+    predictor = MHDPredictor()
+    signature = model_signature(predictor.model_path)
+    feature_source = predictor.feature_source
+
+    con = connect_results(db_file)
+    available = set(available_shots())
+    pending = [shot for shot in shot_numbers if shot in available]
+    if not rescan:
+        already_done = done_shots(con, signature)
+        pending = [shot for shot in pending if shot not in already_done]
+
+    summary = {"requested": len(shot_numbers), "available": len(available.intersection(shot_numbers)),
+               "scanned": 0, "mhd": 0, "errors": 0}
+    if not pending:
+        con.close()
+        return summary
+
+    start = time.perf_counter()
+    with Pool(processes=workers, initializer=_init_worker, initargs=(feature_source,)) as pool:
+        batch_features, batch_results, failed = [], [], []
+
+        def flush():
+            if batch_features:
+                try:
+                    predictor.classify(np.vstack(batch_features), batch_results)
+                except Exception as e:
+                    for result in batch_results:
+                        result["error"] = f"ERROR: Prediction failed: {e}"
+            write_results(con, batch_results + failed, signature, feature_source)
+            summary["scanned"] += len(batch_results) + len(failed)
+            summary["mhd"] += sum(1 for result in batch_results if result["mhd"])
+            summary["errors"] += len(failed) + sum(1 for result in batch_results if result["error"])
+            batch_features.clear()
+            batch_results.clear()
+            failed.clear()
+            print(f"{summary['scanned']}/{len(pending)} shots classified "
+                  f"({time.perf_counter() - start:.1f} s)", flush=True)
+
+        for features, result in pool.imap_unordered(_shot_features, pending, chunksize=4):
+            if features is None:
+                failed.append(result)
+            else:
+                batch_features.append(features)
+                batch_results.append(result)
+            if len(batch_results) + len(failed) >= batch_size:
+                flush()
+        flush()
+
+    con.close()
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch MHD classification of a campaign")
+    parser.add_argument("shots", nargs="*", help="Shot numbers or ranges (56000-56999)")
+    parser.add_argument("--all", action="store_true", help="Scan every shot with a MIR5C raw file")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Shots classified and written per batch")
+    parser.add_argument("--db", default=RESULTS_DB, help="SQLite results database")
+    parser.add_argument("--rescan", action="store_true", help="Classify again shots that are already in the database")
+    args = parser.parse_args()
+
+    shot_numbers = available_shots() if args.all else parse_shots(args.shots)
+    if not shot_numbers:
+        print("ERROR: No shot number provided.")
+        sys.exit(1)
+    if not os.path.exists(model_path):
+        print(f"ERROR: Model {model_path} not found.")
+        sys.exit(1)
+
+    summary = scan(shot_numbers, args.workers, args.db, args.batch_size, args.rescan)
+    print(f"Requested: {summary['requested']}, with raw data: {summary['available']}, "
+          f"classified now: {summary['scanned']}, MHD: {summary['mhd']}, errors: {summary['errors']}")
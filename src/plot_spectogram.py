@@ -1,69 +1,178 @@
-import numpy as np
-import matplotlib.pyplot as plt
-import scipy.signal as signal
+import argparse
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.signal as signal
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from raw_data import available_shots, read_window, RAW_DATA_FOLDER
 
 minX = 1050
 maxX = 1250
 
-if len(sys.argv) < 2:
-    print("ERROR: No shot number provided.")
-    sys.exit(1)
-
-shot_number = sys.argv[1]
-
-file_path = f"../utilities/similPatternTool/raw_data/MIR5C_{shot_number}_{shot_number}.txt"
-
-if not os.path.exists(file_path):
-    print(f"ERROR: File not found.")
-    sys.exit(1)
-
-output_dir = "./spectograms/spectograms_for_try"
-os.makedirs(output_dir, exist_ok=True)
-
-color_filename = os.path.join(output_dir, f"{shot_number}.png")
-heatmap_filename = os.path.join(output_dir, f"{shot_number}_N.png")
-bw_filename = os.path.join(output_dir, f"{shot_number}_N_bw.png")
-
-data = np.loadtxt(file_path, delimiter=' ', skiprows=1)
-
-x = data[:, 0].astype(float)
-y = data[:, 1].astype(float)
-
-indices_x = np.where((x >= minX) & (x <= maxX))
-x = x[indices_x]
-y = y[indices_x]
-
-nfft = 2**10
-overlap = 0.8
+NFFT = 2**10
+OVERLAP = 0.8
 ST = 0.001
-fs = 1 / ST
-
-f, t, B = signal.spectrogram(y, fs=fs, window='hann', nperseg=nfft, noverlap=int(overlap * nfft))
-
-Tin = x[0]
-t = t + Tin
 
-B_dB = 10 * np.log10(np.abs(B))
-
-min_dB, max_dB = np.min(B_dB), np.max(B_dB)
-B_scaled = (B_dB - min_dB) / (max_dB - min_dB)
-
-def save_spectrogram(data, filename, cmap, title, colorbar_label):
-    plt.figure(figsize=(10, 6))
-    plt.imshow(data, aspect='auto', extent=[t[0], t[-1], f[0], f[-1]], origin='lower', cmap=cmap)
-    plt.colorbar(label=colorbar_label)
-    plt.xlabel("Time (ms)")
-    plt.ylabel("Frequency (kHz)")
-    plt.title(title)
-    plt.gca().set_facecolor('white')
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
-    plt.close()
-
-save_spectrogram(B_scaled, heatmap_filename, 'turbo', "Spectrogram - Heatmap (Red-Yellow-Blue)", "Normalized Power")
-save_spectrogram(B_scaled, bw_filename, 'gray', "Spectrogram - Grayscale", "Normalized Power")
-save_spectrogram(B_dB, color_filename, 'jet', "Spectrogram - Plasma (Blue)", "Power (dB)")
-
-print(color_filename)
-sys.exit(0)
\ No newline at end of file
+output_dir = "./spectograms/spectograms_for_try"
+array_dir = "./spectograms/arrays"
+
+def load_raw_signal(shot_number, tmin=None, tmax=None):
+    """Lee el fichero MIR5C de un shot (convertido o en texto) y devuelve las columnas (x, y) en [tmin, tmax]."""
+    return read_window(shot_number, tmin, tmax)
+
+def compute_spectrogram(x, y, tmin=minX, tmax=maxX, nfft=NFFT, overlap=OVERLAP):
+    """
+    Calcula el espectrograma de la señal (x, y) dentro de la ventana [tmin, tmax].
+
+    Devuelve las frecuencias f, los tiempos t (desplazados al inicio de la
+    ventana) y la potencia B en escala lineal.
+    """
+    indices_x = np.where((x >= tmin) & (x <= tmax))
+    x = x[indices_x]
+    y = y[indices_x]
+
+    if len(y) == 0:
+        raise ValueError(f"No samples between {tmin} and {tmax} ms.")
+
+    fs = 1 / ST
+    f, t, B = signal.spectrogram(y, fs=fs, window='hann', nperseg=min(nfft, len(y)),
+                                 noverlap=int(overlap * min(nfft, len(y))))
+
+    return f, t + x[0], B
+
+def power_to_db(B):
+    """Convierte la potencia a dB y devuelve también su versión normalizada en [0, 1]."""
+    B_dB = 10 * np.log10(np.abs(B))
+
+    min_dB, max_dB = np.min(B_dB), np.max(B_dB)
+    B_scaled = (B_dB - min_dB) / (max_dB - min_dB)
+    return B_dB, B_scaled
+
+def save_spectrogram(data, f, t, filename, cmap, title, colorbar_label):
+    """Guarda una matriz del espectrograma como PNG con ejes y barra de color."""
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    image = ax.imshow(data, aspect='auto', extent=[t[0], t[-1], f[0], f[-1]], origin='lower', cmap=cmap)
+    fig.colorbar(image, ax=ax, label=colorbar_label)
+    ax.set_xlabel("Time (ms)")
+    ax.set_ylabel("Frequency (kHz)")
+    ax.set_title(title)
+    ax.set_facecolor('white')
+    fig.savefig(filename, dpi=300, bbox_inches='tight')
+
+# Tipos de imagen: sufijo del fichero, mapa de color, título, etiqueta de la barra y si usa dB o la escala normalizada
+IMAGE_KINDS = {
+    "color": ("", 'jet', "Spectrogram - Plasma (Blue)", "Power (dB)", True),
+    "heatmap": ("_N", 'turbo', "Spectrogram - Heatmap (Red-Yellow-Blue)", "Normalized Power", False),
+    "bw": ("_N_bw", 'gray', "Spectrogram - Grayscale", "Normalized Power", False),
+}
+
+def spectrogram_array_path(shot_number, folder=None):
+    """Ruta del .npz con la matriz en dB y los ejes del espectrograma de un shot."""
+    return os.path.join(folder or array_dir, f"{shot_number}.npz")
+
+def save_spectrogram_arrays(shot_number, f, t, B_dB, folder=None):
+    """Guarda la matriz en dB (float32) y los ejes f y t de un espectrograma."""
+    path = spectrogram_array_path(shot_number, folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path, f=f.astype(np.float32), t=t.astype(np.float32), B_dB=B_dB.astype(np.float32))
+    return path
+
+def load_spectrogram_arrays(shot_number, folder=None):
+    """Devuelve (f, t, B_dB) del espectrograma guardado de un shot, o None si no existe."""
+    path = spectrogram_array_path(shot_number, folder)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as arrays:
+        return arrays["f"], arrays["t"], arrays["B_dB"]
+
+def generate_spectrogram_arrays(shot_number, folder=None):
+    """Calcula el espectrograma de un shot desde el fichero MIR5C y guarda sólo los arrays."""
+    x, y = load_raw_signal(shot_number, minX, maxX)
+    f, t, B = compute_spectrogram(x, y)
+    B_dB, _ = power_to_db(B)
+    save_spectrogram_arrays(shot_number, f, t, B_dB, folder)
+    return f, t, B_dB
+
+def get_spectrogram_arrays(shot_number, folder=None):
+    """Devuelve (f, t, B_dB) del almacén numérico, calculándolos si todavía no existen."""
+    arrays = load_spectrogram_arrays(shot_number, folder)
+    if arrays is None:
+        arrays = generate_spectrogram_arrays(shot_number, folder)
+    return arrays
+
+def render_spectrogram_images(shot_number, kinds=tuple(IMAGE_KINDS), folder=output_dir, arrays=None):
+    """
+    Dibuja como PNG, sólo para visualización, las imágenes pedidas que aún no
+    existan. Parte del almacén numérico, sin volver a leer el fichero MIR5C.
+    Devuelve la ruta de la primera imagen pedida.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+
+    for kind in kinds:
+        suffix, cmap, title, colorbar_label, use_db = IMAGE_KINDS[kind]
+        filename = os.path.join(folder, f"{shot_number}{suffix}.png")
+        paths.append(filename)
+        if os.path.exists(filename):
+            continue
+
+        if arrays is None:
+            arrays = get_spectrogram_arrays(shot_number)
+        f, t, B_dB = arrays
+        min_dB, max_dB = np.min(B_dB), np.max(B_dB)
+        data = B_dB if use_db else (B_dB - min_dB) / (max_dB - min_dB)
+        save_spectrogram(data, f, t, filename, cmap, title, colorbar_label)
+
+    return paths[0]
+
+def generate_spectrogram(shot_number, folder=output_dir, images=True):
+    """
+    Genera el espectrograma de un shot: guarda los arrays y, si `images` es
+    True, también las tres imágenes PNG. Devuelve la ruta de la imagen de
+    color (o la del .npz si no se generan imágenes), o None si falla.
+    """
+    try:
+        arrays = get_spectrogram_arrays(shot_number)
+        if not images:
+            return spectrogram_array_path(shot_number)
+        return render_spectrogram_images(shot_number, folder=folder, arrays=arrays)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Spectrogram for shot {shot_number} could not be generated: {e}")
+        return None
+
+def generate_spectrograms(shot_numbers, workers=None, folder=output_dir, images=True):
+    """Genera los espectrogramas de varios shots en un pool de procesos. Devuelve {shot: ruta o None}."""
+    shot_numbers = list(shot_numbers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        paths = executor.map(generate_spectrogram, shot_numbers, [folder] * len(shot_numbers),
+                             [images] * len(shot_numbers))
+        return dict(zip(shot_numbers, paths))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera espectrogramas a partir de los ficheros MIR5C.")
+    parser.add_argument("shots", nargs="*", help="Shot numbers")
+    parser.add_argument("--all", action="store_true", help=f"Process every MIR5C file in {RAW_DATA_FOLDER}")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--no-images", action="store_true", help=f"Only store the numeric arrays in {array_dir}")
+    args = parser.parse_args()
+
+    shot_numbers = available_shots() if args.all else args.shots
+    if not shot_numbers:
+        print("ERROR: No shot number provided.")
+        sys.exit(1)
+
+    if len(shot_numbers) == 1:
+        color_filename = generate_spectrogram(shot_numbers[0], images=not args.no_images)
+        if color_filename is None:
+            sys.exit(1)
+        print(color_filename)
+        sys.exit(0)
+
+    results = generate_spectrograms(shot_numbers, workers=args.workers, images=not args.no_images)
+    for shot_number, color_filename in results.items():
+        print(color_filename or f"ERROR: {shot_number}")
+    sys.exit(0 if all(results.values()) else 1)
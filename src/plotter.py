@@ -1,50 +1,106 @@
-import matplotlib.pyplot as plt
-import re
+import os
 import io
-from PIL import Image
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from decimation import minmax_decimate, PLOT_MAX_POINTS
+from signal_registry import group_signals
 
-def group_signals(signals):
-    """Agrupa señales por prefijo común usando expresiones regulares."""
-    grouped_signals = {}
+FIGSIZE = (10, 6)
+PLOT_WORKERS = min(4, os.cpu_count() or 1)
+# Por debajo de este número de grupos no compensa repartir el trabajo entre procesos
+PARALLEL_MIN_GROUPS = 4
 
-    for signal in signals:
-        match = re.match(r"([A-Za-z_]+)\d*", signal)
-        if match:
-            prefix = match.group(1)
-            if prefix not in grouped_signals:
-                grouped_signals[prefix] = []
-            grouped_signals[prefix].append(signal)
-        else:
-            grouped_signals[signal] = [signal]
+_local = threading.local()
+_pool = None
 
-    return grouped_signals
+def _get_figure():
+    """Devuelve la figura Agg de este hilo, creándola sólo la primera vez."""
+    if not hasattr(_local, "figure"):
+        # matplotlib se importa al dibujar: `plot_groups` se puede usar sin cargarlo
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-def plot_data_per_signal(data_points_dict):
+        figure = Figure(figsize=FIGSIZE)
+        FigureCanvasAgg(figure)
+        _local.figure = figure
+        _local.ax = figure.add_subplot()
+    return _local.figure, _local.ax
+
+def render_group(title, series, output="pil"):
     """
-    Genera gráficos por grupos de señales y devuelve una lista de imágenes PIL.
+    Dibuja un grupo de señales en la figura reutilizable, sin pasar por pyplot.
+
+    `series` es una lista de (nombre, x, y). Según `output` devuelve una
+    imagen PIL ("pil"), el buffer RGBA como array de NumPy ("rgba") o los
+    bytes PNG ya codificados ("png").
     """
-    grouped_signals = group_signals(data_points_dict.keys())
-    images = []
+    figure, ax = _get_figure()
+    ax.clear()
+
+    for signal_name, x_values, y_values in series:
+        ax.plot(x_values, y_values, label=signal_name, linewidth=1.5)
+
+    ax.set_title(title)
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Value")
+    ax.legend()
+    ax.grid()
+
+    if output == "png":
+        img_buf = io.BytesIO()
+        figure.savefig(img_buf, format="png")
+        return img_buf.getvalue()
+
+    figure.canvas.draw()
+    rgba = np.array(figure.canvas.buffer_rgba())
+    if output == "rgba":
+        return rgba
+    from PIL import Image
+
+    return Image.fromarray(rgba)
 
-    for group_name, signal_names in grouped_signals.items():
-        fig, ax = plt.subplots(figsize=(10, 6))
+def _get_pool(workers):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
 
+def _render_group_args(args):
+    return render_group(*args)
+
+def plot_groups(data_points_dict, shot=None, max_points=PLOT_MAX_POINTS):
+    """
+    Agrupa las señales por familia y reduce cada una a `max_points` puntos:
+    devuelve [(título, series)] listos para `render_group`. Si se indica
+    `shot`, se añade al título.
+    """
+    groups = []
+    for group_name, signal_names in group_signals(data_points_dict.keys()).items():
+        series = []
         for signal_name in signal_names:
             if signal_name in data_points_dict:
-                x_values, y_values = zip(*data_points_dict[signal_name])
-                ax.plot(x_values, y_values, label=signal_name, linewidth=1.5)
+                x_values, y_values = minmax_decimate(*data_points_dict[signal_name], max_points)
+                series.append((signal_name, x_values, y_values))
 
-        ax.set_title(f"Graph for {group_name} signals")
-        ax.set_xlabel("Time")
-        ax.set_ylabel("Value")
-        ax.legend()
-        ax.grid()
+        title = f"Graph for {group_name} signals"
+        groups.append((f"{title} (shot {shot})" if shot is not None else title, series))
+    return groups
 
-        img_buf = io.BytesIO()
-        plt.savefig(img_buf, format="png")
-        plt.close(fig)
-        img_buf.seek(0)  
+def plot_data_per_signal(data_points_dict, shot=None, max_points=PLOT_MAX_POINTS, output="pil", workers=PLOT_WORKERS):
+    """
+    Genera gráficos por grupos de señales y devuelve una lista de imágenes PIL.
+    Si se indica `shot`, se añade al título (útil al comparar varias descargas).
+    Cada señal se reduce a `max_points` puntos con decimación min/max
+    (`max_points=None` dibuja todas las muestras).
+
+    Con `output="rgba"` o `output="png"` se devuelven arrays RGBA o bytes PNG
+    en lugar de imágenes PIL. Si hay muchos grupos, se dibujan en paralelo en
+    un pool de `workers` procesos.
+    """
+    tasks = [(title, series, output) for title, series in plot_groups(data_points_dict, shot, max_points)]
 
-        images.append(Image.open(img_buf))
+    if workers and workers > 1 and len(tasks) >= PARALLEL_MIN_GROUPS:
+        return list(_get_pool(workers).map(_render_group_args, tasks))
 
-    return images
+    return [render_group(*task) for task in tasks]
@@ -2,20 +2,22 @@ import os
 import cv2
 import numpy as np
 import joblib
-import subprocess
 import sys
+import time
+from matplotlib import colormaps
 from skimage.feature import hog
+from plot_spectogram import generate_spectrogram, get_spectrogram_arrays, load_spectrogram_arrays, IMAGE_KINDS
 
 model_path = "config/mhd_detector_model.pkl"
 input_folders = ["./spectograms/spectograms_for_ai_learning", "./spectograms/spectograms_for_try"]
-utilities_folder = "../utilities/similPatternTool/raw_data/"
-plot_script = "plot_spectogram.py"
 
-if not os.path.exists(model_path):
-    print(f"ERROR: Model {model_path} not found.")
-    sys.exit(1)
+FEATURE_SIZE = 24300
+IMAGE_SIZE = (128, 128)
 
-model = joblib.load(model_path)
+# Origen de las características con el que se entrenó el modelo: "png" (las
+# tres imágenes renderizadas) o "array" (directamente desde la matriz en dB).
+# classifier.py lo guarda en el atributo `feature_source_` del modelo.
+DEFAULT_FEATURE_SOURCE = "png"
 
 def check_spectrogram_exists(shot_number):
     """Check if spectrogram exists in any of the input folders."""
@@ -24,77 +26,239 @@ def check_spectrogram_exists(shot_number):
             return folder
     return None
 
-def generate_spectrogram(shot_number):
-    """Ejecuta plot_spectogram.py y devuelve la imagen generada."""
-    result = subprocess.run(
-        [sys.executable, plot_script, str(shot_number)],
-        capture_output=True, text=True
-    )
-
-    if result.returncode == 0:
-        generated_image = result.stdout.strip()
-        return generated_image if generated_image.endswith(".png") else None
-    return None
-
 def load_images_for_shot(shot_number, spectrogram_path):
     """Carga las tres imágenes del espectrograma: Original, N y N_bw."""
     filenames = [f"{shot_number}.png", f"{shot_number}_N.png", f"{shot_number}_N_bw.png"]
-    
+
     images = []
     for filename in filenames:
         img_path = os.path.join(spectrogram_path, filename)
         if os.path.exists(img_path):
             img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
             if img is not None:
-                images.append(cv2.resize(img, (128, 128))) 
+                images.append(cv2.resize(img, (128, 128)))
 
     return images if len(images) == 3 else None
 
+def images_from_spectrogram(B_dB, size=IMAGE_SIZE):
+    """
+    Construye directamente desde la matriz en dB las tres imágenes en gris de
+    128x128 (color, heatmap y gris) que se pasan a HOG, sin renderizar PNGs.
+    """
+    min_dB, max_dB = np.min(B_dB), np.max(B_dB)
+    # origin='lower': en la imagen las frecuencias altas quedan arriba
+    B_scaled = np.flipud((B_dB - min_dB) / (max_dB - min_dB))
+
+    images = []
+    for _, cmap, _, _, _ in IMAGE_KINDS.values():
+        rgb = colormaps[cmap](B_scaled)[..., :3]
+        gray = rgb @ np.array([0.299, 0.587, 0.114])
+        img = (gray * 255).astype(np.uint8)
+        images.append(cv2.resize(img, size, interpolation=cv2.INTER_AREA))
+    return images
+
 def extract_features_from_images(images):
     """Extrae características HOG de las tres imágenes y las concatena."""
     hog_features = []
     for img in images:
         features = hog(img, orientations=9, pixels_per_cell=(8, 8),
                        cells_per_block=(2, 2), visualize=False)
-        hog_features.extend(features) 
+        hog_features.extend(features)
     return np.array(hog_features)
 
-def predict_mhd(shot_number, generate_if_missing):
-    """Predice si el espectrograma tiene MHD usando las tres imágenes."""
-    spectrogram_path = check_spectrogram_exists(shot_number)
-    
-    if not spectrogram_path:
-        if generate_if_missing == "Yes":
-            spectrogram_path = generate_spectrogram(shot_number)
-            spectrogram_path = os.path.dirname(spectrogram_path)
-            if not spectrogram_path:
-                print(f"ERROR: Could not generate spectrogram for shot {shot_number}.")
-                sys.exit(1)
+def format_result(result):
+    """Devuelve el resultado de una predicción con el formato de texto clásico."""
+    if result["error"]:
+        return result["error"]
+    return f"SUCCESS: Spectrogram {result['shot']} MHD? {'Yes' if result['mhd'] else 'No'}"
+
+
+class MHDPredictor:
+    """
+    Predictor de MHD de larga duración: carga el modelo una sola vez y lo
+    reutiliza en todas las predicciones.
+
+    Cada predicción devuelve un diccionario con las claves:
+    shot, label, mhd, probability, spectrogram_path, timings y error.
+    `spectrogram_path` es la carpeta con los PNG del shot, o None si el
+    modelo trabaja sobre arrays y todavía no se han dibujado.
+    """
+
+    def __init__(self, model_path=model_path, feature_source=None):
+        self.model_path = model_path
+        self._model = None
+        # Permite calcular características sin cargar el modelo (p. ej. en procesos auxiliares)
+        self._feature_source = feature_source
+
+    @property
+    def model(self):
+        """Carga el modelo en la primera llamada y lo mantiene en memoria."""
+        if self._model is None:
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(f"Model {self.model_path} not found.")
+            self._model = joblib.load(self.model_path)
+        return self._model
+
+    def _new_result(self, shot_number):
+        return {
+            "shot": shot_number,
+            "label": None,
+            "mhd": None,
+            "probability": None,
+            "spectrogram_path": None,
+            "timings": {},
+            "error": None,
+        }
+
+    @property
+    def feature_source(self):
+        if self._feature_source is not None:
+            return self._feature_source
+        return getattr(self.model, "feature_source_", DEFAULT_FEATURE_SOURCE)
+
+    def _images_from_pngs(self, shot_number, generate_if_missing, result):
+        start = time.perf_counter()
+        spectrogram_path = check_spectrogram_exists(shot_number)
+
+        if not spectrogram_path:
+            if not generate_if_missing:
+                result["error"] = f"ERROR: Spectrogram {shot_number} is missing. Cannot predict."
+                return None
+            generated_image = generate_spectrogram(shot_number)
+            result["timings"]["generate"] = time.perf_counter() - start
+            if not generated_image:
+                result["error"] = f"ERROR: Could not generate spectrogram for shot {shot_number}."
+                return None
+            spectrogram_path = os.path.dirname(generated_image)
+
+        result["spectrogram_path"] = spectrogram_path
+
+        load_start = time.perf_counter()
+        images = load_images_for_shot(shot_number, spectrogram_path)
+        result["timings"]["load"] = time.perf_counter() - load_start
+        if images is None:
+            result["error"] = f"ERROR: Spectrogram images for {shot_number} not found."
+        return images
+
+    def _images_from_arrays(self, shot_number, generate_if_missing, result):
+        start = time.perf_counter()
+        try:
+            if generate_if_missing:
+                f, t, B_dB = get_spectrogram_arrays(shot_number)
+            else:
+                arrays = load_spectrogram_arrays(shot_number)
+                if arrays is None:
+                    result["error"] = f"ERROR: Spectrogram {shot_number} is missing. Cannot predict."
+                    return None
+                f, t, B_dB = arrays
+        except (OSError, ValueError) as e:
+            result["error"] = f"ERROR: Could not generate spectrogram for shot {shot_number}: {e}"
+            return None
+        result["timings"]["load"] = time.perf_counter() - start
+
+        result["spectrogram_path"] = check_spectrogram_exists(shot_number)
+        return images_from_spectrogram(B_dB)
+
+    def _features_for_shot(self, shot_number, generate_if_missing, result):
+        """Localiza (o genera) el espectrograma del shot y calcula sus características."""
+        if self.feature_source == "array":
+            images = self._images_from_arrays(shot_number, generate_if_missing, result)
         else:
-            print(f"ERROR: Spectrogram {shot_number} is missing. Cannot predict.")
-            sys.exit(1)
+            images = self._images_from_pngs(shot_number, generate_if_missing, result)
+        if images is None:
+            return None
 
-    images = load_images_for_shot(shot_number, spectrogram_path)
-    if images is None:
-        print(f"ERROR: Spectrogram images for {shot_number} not found.")
-        sys.exit(1)
+        features_start = time.perf_counter()
+        features = extract_features_from_images(images)
+        result["timings"]["features"] = time.perf_counter() - features_start
+        if len(features) != FEATURE_SIZE:
+            result["error"] = f"ERROR: Incorrect feature size ({len(features)} instead of {FEATURE_SIZE})"
+            return None
+
+        return features
+
+    def features(self, shot_number, generate_if_missing=True):
+        """Devuelve (vector de características o None, diccionario de resultado con timings y error)."""
+        result = self._new_result(shot_number)
+        return self._features_for_shot(shot_number, generate_if_missing, result), result
+
+    def classify(self, features, results):
+        """Clasifica la matriz de características con una sola llamada al modelo."""
+        start = time.perf_counter()
+        model = self.model
+        labels = model.predict(features)
+
+        probabilities = None
+        if hasattr(model, "predict_proba") and 1 in list(model.classes_):
+            try:
+                mhd_column = list(model.classes_).index(1)
+                probabilities = model.predict_proba(features)[:, mhd_column]
+            except AttributeError:
+                # SVC entrenado sin probability=True
+                probabilities = None
+
+        elapsed = (time.perf_counter() - start) / len(results)
+        for i, result in enumerate(results):
+            result["label"] = int(labels[i])
+            result["mhd"] = result["label"] == 1
+            if probabilities is not None:
+                result["probability"] = float(probabilities[i])
+            result["timings"]["predict"] = elapsed
+
+    def predict(self, shot_number, generate_if_missing=True):
+        """Predice si el espectrograma de un shot tiene MHD."""
+        return self.predict_many([shot_number], generate_if_missing)[0]
+
+    def predict_many(self, shot_numbers, generate_if_missing=True):
+        """Predice MHD para varios shots, clasificándolos todos a la vez."""
+        try:
+            self.model
+        except Exception as e:
+            return [dict(self._new_result(shot_number), error=f"ERROR: {e}") for shot_number in shot_numbers]
 
-    features = extract_features_from_images(images)
-    if features is None or len(features) != 24300:
-        print(f"ERROR: Incorrect feature size ({len(features)} instead of 24300)")
+        results = []
+        valid_results = []
+        valid_features = []
+
+        for shot_number in shot_numbers:
+            result = self._new_result(shot_number)
+            results.append(result)
+
+            if shot_number is None:
+                result["error"] = "ERROR: No valid shot number provided."
+                continue
+
+            features = self._features_for_shot(shot_number, generate_if_missing, result)
+            if features is not None:
+                valid_results.append(result)
+                valid_features.append(features)
+
+        if valid_features:
+            try:
+                self.classify(np.vstack(valid_features), valid_results)
+            except Exception as e:
+                for result in valid_results:
+                    result["error"] = f"ERROR: Prediction failed: {e}"
+
+        return results
+
+
+def predict_mhd(shot_number, generate_if_missing):
+    """Predice si el espectrograma tiene MHD usando las tres imágenes."""
+    if not os.path.exists(model_path):
+        print(f"ERROR: Model {model_path} not found.")
         sys.exit(1)
 
-    prediction = model.predict([features])[0]
-    result_text = f"SUCCESS: Spectrogram {shot_number} MHD? {'Yes' if prediction == 1 else 'No'}"
+    result = MHDPredictor().predict(shot_number, generate_if_missing == "Yes")
 
-    print(result_text)
-    sys.exit(0)
+    print(format_result(result))
+    sys.exit(1 if result["error"] else 0)
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
         print("ERROR: No spectrogram number or missing generation option provided.")
         sys.exit(1)
-        
+
 
     shot_number = sys.argv[1]
     generate_if_missing = sys.argv[2]
@@ -0,0 +1,132 @@
+"""
+Capa de acceso a los ficheros MIR5C de datos brutos.
+
+Los ficheros de texto `MIR5C_{shot}_{shot}.txt` se convierten una sola vez a
+formato binario columnar: un .npy con la columna de tiempo (float64, que hace
+de índice temporal porque está ordenada) y otro con la señal. Una ventana
+temporal se lee con `np.load(mmap_mode="r")` y una búsqueda binaria sobre el
+tiempo, sin parsear ni cargar el fichero entero. Los ficheros que aún no se
+han convertido se leen con el parser en C de pandas.
+
+Uso:
+    python raw_data.py convert [--folder ../utilities/similPatternTool/raw_data/] [--dtype float32]
+"""
+import argparse
+import os
+import re
+import numpy as np
+import pandas as pd
+
+RAW_DATA_FOLDER = "../utilities/similPatternTool/raw_data/"
+BINARY_SUBFOLDER = "npy"
+
+RAW_FILE_PATTERN = re.compile(r"MIR5C_(\d+)_\1\.txt$")
+
+def raw_data_path(shot_number, folder=None):
+    """Ruta del fichero MIR5C en texto de un shot."""
+    return os.path.join(folder or RAW_DATA_FOLDER, f"MIR5C_{shot_number}_{shot_number}.txt")
+
+def binary_paths(shot_number, folder=None):
+    """Rutas de los .npy de tiempo y de señal de un shot."""
+    binary_folder = os.path.join(folder or RAW_DATA_FOLDER, BINARY_SUBFOLDER)
+    return (os.path.join(binary_folder, f"MIR5C_{shot_number}_t.npy"),
+            os.path.join(binary_folder, f"MIR5C_{shot_number}_y.npy"))
+
+def available_shots(folder=None):
+    """Devuelve, ordenados, los shots con fichero MIR5C en la carpeta de datos brutos."""
+    folder = folder or RAW_DATA_FOLDER
+    if not os.path.isdir(folder):
+        return []
+    shots = []
+    for filename in os.listdir(folder):
+        match = RAW_FILE_PATTERN.match(filename)
+        if match:
+            shots.append(int(match.group(1)))
+    return sorted(shots)
+
+def read_text_file(path):
+    """Lee las dos primeras columnas de un fichero MIR5C en texto con el parser en C de pandas."""
+    data = pd.read_csv(path, sep=" ", skiprows=1, header=None, usecols=[0, 1],
+                       dtype=np.float64, engine="c")
+    return data[0].to_numpy(), data[1].to_numpy()
+
+def is_converted(shot_number, folder=None):
+    """True si los .npy del shot existen y son más recientes que el fichero de texto."""
+    t_path, y_path = binary_paths(shot_number, folder)
+    if not (os.path.exists(t_path) and os.path.exists(y_path)):
+        return False
+    text_path = raw_data_path(shot_number, folder)
+    if not os.path.exists(text_path):
+        return True
+    return min(os.path.getmtime(t_path), os.path.getmtime(y_path)) >= os.path.getmtime(text_path)
+
+def convert_to_binary(shot_number, folder=None, dtype=np.float64):
+    """Convierte el fichero de texto de un shot a .npy (tiempo en float64, señal en `dtype`)."""
+    x, y = read_text_file(raw_data_path(shot_number, folder))
+
+    order = np.argsort(x, kind="stable")
+    if np.any(order != np.arange(len(order))):
+        x, y = x[order], y[order]
+
+    t_path, y_path = binary_paths(shot_number, folder)
+    os.makedirs(os.path.dirname(t_path), exist_ok=True)
+    for path, values in ((t_path, x), (y_path, y.astype(dtype))):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, values)
+        os.replace(tmp_path, path)
+    return t_path, y_path
+
+def convert_folder(folder=None, dtype=np.float64, force=False):
+    """Convierte todos los ficheros MIR5C de la carpeta que no estén ya convertidos."""
+    converted, skipped, failed = [], [], []
+    for shot_number in available_shots(folder):
+        if not force and is_converted(shot_number, folder):
+            skipped.append(shot_number)
+            continue
+        try:
+            convert_to_binary(shot_number, folder, dtype)
+            converted.append(shot_number)
+        except (OSError, ValueError) as e:
+            print(f"Error converting shot {shot_number}: {e}")
+            failed.append(shot_number)
+    return converted, skipped, failed
+
+def read_window(shot_number, tmin=None, tmax=None, folder=None):
+    """
+    Devuelve las columnas (x, y) del shot dentro de [tmin, tmax].
+
+    Si el shot está convertido se recorta el memory map sin leer el resto del
+    fichero; si no, se parsea el texto completo y se recorta en memoria.
+    """
+    if is_converted(shot_number, folder):
+        t_path, y_path = binary_paths(shot_number, folder)
+        x = np.load(t_path, mmap_mode="r")
+        y = np.load(y_path, mmap_mode="r")
+    else:
+        text_path = raw_data_path(shot_number, folder)
+        if not os.path.exists(text_path):
+            raise FileNotFoundError(f"File not found: {text_path}")
+        x, y = read_text_file(text_path)
+        mask = np.ones(len(x), dtype=bool)
+        if tmin is not None:
+            mask &= x >= tmin
+        if tmax is not None:
+            mask &= x <= tmax
+        return x[mask], y[mask]
+
+    first = 0 if tmin is None else np.searchsorted(x, tmin, side="left")
+    last = len(x) if tmax is None else np.searchsorted(x, tmax, side="right")
+    return np.array(x[first:last], dtype=np.float64), np.array(y[first:last], dtype=np.float64)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte los ficheros MIR5C de texto a .npy con memory map.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Convert every MIR5C text file in the folder")
+    convert_parser.add_argument("--folder", default=RAW_DATA_FOLDER)
+    convert_parser.add_argument("--dtype", choices=["float32", "float64"], default="float64",
+                                help="Storage type of the signal column (time is always float64)")
+    convert_parser.add_argument("--force", action="store_true", help="Convert files that are already up to date")
+    args = parser.parse_args()
+
+    converted, skipped, failed = convert_folder(args.folder, np.dtype(args.dtype), args.force)
+    print(f"Converted: {len(converted)}, up to date: {len(skipped)}, failed: {len(failed)}")
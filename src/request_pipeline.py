@@ -0,0 +1,284 @@
+"""
+Tubería asíncrona para atender varias peticiones del chatbot a la vez.
+
+Cada petición pasa por etapas con su propio límite de concurrencia:
+- LLM: los pasos que pueden consultar al modelo se ejecutan en hilos; el
+  límite (`LLM_CONCURRENCY` en `llm_backends`) se aplica en la propia llamada
+  al modelo, así que las respuestas en caché o resueltas por reglas no esperan.
+- Red: descargas de TJII_data.cgi con el `FetchEngine` compartido, en hilos,
+  como mucho `network_limit` a la vez.
+- CPU: gráficos y predicciones en un pool de `cpu_workers` procesos.
+
+Delante hay una cola acotada: si ya hay `max_pending` peticiones esperando
+turno se rechaza la nueva con `PipelineBusy` en lugar de acumular trabajo, y
+cada petición tiene un plazo total (`request_timeout`) que se aplica a todas
+sus etapas. Así una llamada lenta al LLM o un espectrograma pesado ya no
+bloquea al resto de usuarios.
+
+Los módulos de gráficos y predicción (matplotlib, scipy, OpenCV, skimage,
+scikit-learn) se importan en la primera petición que los necesita, no al
+arrancar; `RequestPipeline.warm_up()` los carga por adelantado en segundo plano.
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from response_templates import render_prediction
+
+MAX_ACTIVE_REQUESTS = 8
+MAX_PENDING_REQUESTS = 32
+REQUEST_TIMEOUT = 180
+NETWORK_LIMIT = 8
+CPU_WORKERS = min(4, os.cpu_count() or 1)
+
+_predictor = None
+_predictor_lock = threading.Lock()
+
+
+class PipelineBusy(Exception):
+    """La cola de peticiones está llena."""
+
+
+def get_predictor():
+    """Predictor MHD de este proceso, creado la primera vez que se usa."""
+    global _predictor
+    with _predictor_lock:
+        if _predictor is None:
+            from predict_spectogram import MHDPredictor
+
+            _predictor = MHDPredictor()
+    return _predictor
+
+def predict_with_image(shot_number, generate_if_missing="No", language="en"):
+    """
+    Predice MHD con el predictor persistente. Devuelve (texto, imagen, ok):
+    el resultado redactado con la plantilla del idioma (o el error) y la
+    ruta de la imagen.
+    """
+    from plot_spectogram import render_spectrogram_images
+
+    try:
+        result = get_predictor().predict(shot_number, generate_if_missing == "Yes")
+
+        if result["error"]:
+            return result["error"], None, False
+
+        if result["spectrogram_path"]:
+            image_path = os.path.join(result["spectrogram_path"], f"{shot_number}.png")
+        else:
+            # El modelo trabaja sobre arrays: la imagen sólo se dibuja para mostrarla
+            image_path = render_spectrogram_images(shot_number, kinds=("color",))
+        if not os.path.exists(image_path):
+            return f"Error: Image for shot {shot_number} not found.", None, False
+
+        return render_prediction(result, language), image_path, True
+
+    except Exception as e:
+        return f"Error running prediction: {e}", None, False
+
+def plot_groups(data_points_dict, shot=None):
+    """
+    Grupos de señales ya decimados, [(título, series)], calculados en el
+    proceso principal: al pool de CPU sólo llegan arrays de
+    `PLOT_MAX_POINTS` puntos, y cada grupo se dibuja como una tarea de CPU
+    distinta (en paralelo dentro de los límites de la tubería).
+    """
+    from plotter import plot_groups
+
+    return plot_groups(data_points_dict, shot)
+
+def render_group(title, series):
+    """Dibuja un grupo de señales como array RGBA (se ejecuta en el pool de CPU)."""
+    from plotter import render_group
+
+    return render_group(title, series, output="rgba")
+
+def warm_up_worker():
+    """Importa los módulos de gráficos y predicción y carga el modelo MHD en este proceso."""
+    import plotter
+    import plot_spectogram
+    # plotter importa matplotlib al dibujar el primer grupo
+    import matplotlib.backends.backend_agg
+
+    get_predictor()
+
+
+class PipelineRequest:
+    """Una petición admitida: ejecuta sus etapas respetando los límites y el plazo."""
+
+    def __init__(self, pipeline, deadline):
+        self.pipeline = pipeline
+        self.deadline = deadline
+        self.started = time.perf_counter()
+        # Tiempo acumulado por tipo de recurso (llm, network, cpu)
+        self.timings = defaultdict(float)
+        # Duración de cada etapa con nombre; las etapas pueden solaparse
+        self.stages = {}
+        self.cancelled = []
+
+    def remaining(self):
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        return remaining
+
+    async def _run(self, stage, semaphore, executor, func, *args):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            async with asyncio.timeout(self.remaining()):
+                if semaphore is None:
+                    return await loop.run_in_executor(executor, func, *args)
+                async with semaphore:
+                    return await loop.run_in_executor(executor, func, *args)
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    async def stage(self, name, awaitable, longest=False):
+        """
+        Espera `awaitable` y anota su duración en `stages[name]` (o en
+        `cancelled` si se cancela). Con `longest=True`, las etapas
+        concurrentes con el mismo nombre (un gráfico por shot) guardan la
+        más larga y no la última que termina.
+        """
+        start = time.perf_counter()
+        try:
+            result = await awaitable
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = max(self.stages.get(name, 0.0), elapsed) if longest else elapsed
+        return result
+
+    def report(self):
+        """Duración de las etapas y total de la petición, en segundos."""
+        return {**self.stages, "total": time.perf_counter() - self.started}
+
+    async def llm(self, func, *args, **kwargs):
+        """Paso que puede llamar al LLM (intención, extracción...), en un hilo."""
+        return await self._run("llm", None, self.pipeline.thread_pool(), functools.partial(func, *args, **kwargs))
+
+    async def network(self, func, *args, **kwargs):
+        """Descarga bloqueante (FetchEngine) en un hilo."""
+        return await self._run("network", self.pipeline.network_semaphore, self.pipeline.thread_pool(),
+                               functools.partial(func, *args, **kwargs))
+
+    async def cpu(self, func, *args):
+        """Trabajo de CPU en el pool de procesos; `func` y sus argumentos deben poder serializarse."""
+        return await self._run("cpu", self.pipeline.cpu_semaphore, self.pipeline.cpu_pool(), func, *args)
+
+    async def llm_stream(self, make_stream):
+        """
+        Recorre un generador síncrono de fragmentos del LLM sin bloquear el
+        bucle de eventos. `make_stream` puede devolver también una respuesta
+        completa (texto o diccionario de error), que se emite tal cual.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pool = self.pipeline.thread_pool()
+        sentinel = object()
+        try:
+            stream = await asyncio.wait_for(loop.run_in_executor(pool, make_stream), self.remaining())
+            if isinstance(stream, (str, dict)) or stream is None:
+                yield stream
+                return
+            iterator = iter(stream)
+            while True:
+                chunk = await asyncio.wait_for(loop.run_in_executor(pool, next, iterator, sentinel), self.remaining())
+                if chunk is sentinel:
+                    break
+                yield chunk
+        finally:
+            self.timings["llm"] += time.perf_counter() - start
+
+
+class RequestPipeline:
+    """Límites de concurrencia por etapa, cola acotada y plazos por petición."""
+
+    def __init__(self, max_active=MAX_ACTIVE_REQUESTS, max_pending=MAX_PENDING_REQUESTS,
+                 request_timeout=REQUEST_TIMEOUT, network_limit=NETWORK_LIMIT, cpu_workers=CPU_WORKERS):
+        self.max_active = max_active
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.cpu_workers = cpu_workers
+        self.active_semaphore = asyncio.Semaphore(max_active)
+        self.network_semaphore = asyncio.Semaphore(network_limit)
+        self.cpu_semaphore = asyncio.Semaphore(cpu_workers)
+        self.pending = 0
+        self.counters = defaultdict(int)
+        self.stage_totals = defaultdict(float)
+        self.stage_counts = defaultdict(int)
+        self._pool = None
+        self._threads = None
+
+    def thread_pool(self):
+        # Un hilo por paso bloqueante de cada petición activa (más el streaming)
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=2 * self.max_active)
+        return self._threads
+
+    def cpu_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        return self._pool
+
+    def warm_up(self):
+        """Prepara los procesos de CPU (imports y modelo) en segundo plano; devuelve los futures."""
+        pool = self.cpu_pool()
+        return [pool.submit(warm_up_worker) for _ in range(self.cpu_workers)]
+
+    @asynccontextmanager
+    async def request(self):
+        """
+        Admite una petición: espera turno si hay `max_active` en curso y
+        lanza `PipelineBusy` si la cola ya está llena.
+        """
+        if self.pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise PipelineBusy("Too many requests in progress, please try again in a moment.")
+
+        deadline = time.monotonic() + self.request_timeout
+        self.pending += 1
+        try:
+            async with asyncio.timeout(self.request_timeout):
+                await self.active_semaphore.acquire()
+        except TimeoutError:
+            self.counters["timed_out"] += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        request = PipelineRequest(self, deadline)
+        try:
+            yield request
+            self.counters["completed"] += 1
+        except (asyncio.TimeoutError, TimeoutError):
+            self.counters["timed_out"] += 1
+            raise
+        finally:
+            self.active_semaphore.release()
+            for name, elapsed in request.report().items():
+                self.stage_totals[name] += elapsed
+                self.stage_counts[name] += 1
+            for name in request.cancelled:
+                self.counters[f"cancelled_{name}"] += 1
+
+    def stats(self):
+        """Contadores de la cola y duración media de cada etapa."""
+        stage_mean = {name: self.stage_totals[name] / count for name, count in self.stage_counts.items()}
+        return {"pending": self.pending, **self.counters, "stage_mean": stage_mean}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._threads is not None:
+            self._threads.shutdown(wait=True)
+            self._threads = None
@@ -0,0 +1,130 @@
+"""
+Respuestas con plantillas, sin pasar por el LLM.
+
+Los resultados de una predicción MHD y las formas habituales de resultado
+SQL (ninguna fila, un valor, una fila, una tabla pequeña) se redactan con
+plantillas en español o inglés, según el idioma de la pregunta. Las tablas
+se devuelven como DataFrame para mostrarlas en la interfaz. Sólo las formas
+poco habituales (tablas de más de `TABLE_MAX_ROWS` filas) se pueden
+describir con el LLM, si `LLM_FOR_UNUSUAL_RESULTS=1`.
+"""
+import math
+import os
+import re
+
+TABLE_MAX_ROWS = 50
+# Describir con el LLM los resultados que no encajan en ninguna plantilla
+LLM_FOR_UNUSUAL_RESULTS = os.environ.get("LLM_FOR_UNUSUAL_RESULTS", "0") == "1"
+DEFAULT_LANGUAGE = "en"
+
+SPANISH_HINTS = re.compile(r"[¿¡ñáéíóú]|\b(el|la|los|las|de|del|que|cuantos|cuantas|cual|cuales|descarga|descargas|"
+                           r"tiene|tienen|hay|dame|muestra|fecha|en|con|por|para|se|es|un|una)\b", re.IGNORECASE)
+ENGLISH_HINTS = re.compile(r"\b(the|what|how|many|which|shot|shots|does|do|has|have|is|are|show|give|me|of|in|"
+                           r"with|for|date)\b", re.IGNORECASE)
+AGGREGATE_PATTERN = re.compile(r"^\s*(count|max|min|avg|sum)\s*\(\s*(?:cast\s*\(\s*)?([\w.*]+)", re.IGNORECASE)
+
+TEMPLATES = {
+    "es": {
+        "mhd_yes": "La descarga {shot} tiene actividad MHD{probability}.",
+        "mhd_no": "La descarga {shot} no tiene actividad MHD{probability}.",
+        "probability": " (probabilidad {value:.0%})",
+        "empty": "No se encontraron resultados para esta consulta.",
+        "count": "Hay {value} registros que cumplen la consulta.",
+        "max": "El valor máximo de {column} es {value}.",
+        "min": "El valor mínimo de {column} es {value}.",
+        "avg": "El valor medio de {column} es {value}.",
+        "sum": "La suma de {column} es {value}.",
+        "value": "{column}: {value}",
+        "row": "Resultado:\n{fields}",
+        "table": "Se encontraron {rows} filas.",
+        "truncated": "Se encontraron {rows} filas; se muestran las primeras {shown}.",
+    },
+    "en": {
+        "mhd_yes": "Shot {shot} has MHD activity{probability}.",
+        "mhd_no": "Shot {shot} does not have MHD activity{probability}.",
+        "probability": " (probability {value:.0%})",
+        "empty": "No results were found for this query.",
+        "count": "There are {value} records matching the query.",
+        "max": "The maximum value of {column} is {value}.",
+        "min": "The minimum value of {column} is {value}.",
+        "avg": "The average value of {column} is {value}.",
+        "sum": "The sum of {column} is {value}.",
+        "value": "{column}: {value}",
+        "row": "Result:\n{fields}",
+        "table": "{rows} rows were found.",
+        "truncated": "{rows} rows were found; showing the first {shown}.",
+    },
+}
+
+def detect_language(text):
+    """'es' o 'en' según las palabras de la pregunta (`DEFAULT_LANGUAGE` si no hay pistas)."""
+    spanish = len(SPANISH_HINTS.findall(text or ""))
+    english = len(ENGLISH_HINTS.findall(text or ""))
+    if spanish == english:
+        return DEFAULT_LANGUAGE
+    return "es" if spanish > english else "en"
+
+def template(name, language, **values):
+    return TEMPLATES.get(language, TEMPLATES[DEFAULT_LANGUAGE])[name].format(**values)
+
+def format_value(value):
+    """Números sin decimales innecesarios; el resto como texto."""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "-"
+        return str(int(value)) if value.is_integer() else f"{value:.4g}"
+    text = str(value)
+    return "-" if text in ("None", "nan", "<NA>", "NaT") else text
+
+def render_prediction(result, language=DEFAULT_LANGUAGE):
+    """Frase con el resultado de `MHDPredictor.predict` (o su error tal cual)."""
+    if result["error"]:
+        return result["error"]
+    probability = result.get("probability")
+    probability_text = "" if probability is None else template("probability", language, value=probability)
+    return template("mhd_yes" if result["mhd"] else "mhd_no", language,
+                    shot=result["shot"], probability=probability_text)
+
+def result_shape(df):
+    """Forma del resultado de una consulta: empty, scalar, row, table o large."""
+    if df.empty:
+        return "empty"
+    if df.shape == (1, 1):
+        return "scalar"
+    if len(df) == 1:
+        return "row"
+    return "table" if len(df) <= TABLE_MAX_ROWS else "large"
+
+def render_scalar(column, value, language):
+    match = AGGREGATE_PATTERN.match(column)
+    value = format_value(value)
+    if match:
+        function, argument = match.group(1).lower(), match.group(2)
+        if function == "count":
+            return template("count", language, value=value)
+        return template(function, language, column=argument, value=value)
+    return template("value", language, column=column, value=value)
+
+def render_sql_result(df, language=DEFAULT_LANGUAGE, use_llm=LLM_FOR_UNUSUAL_RESULTS):
+    """
+    Devuelve (texto, tabla) para el DataFrame de una consulta. `tabla` es el
+    DataFrame que se muestra en la interfaz (o None si basta con el texto).
+    Para las formas poco habituales con `use_llm` el texto es None: la
+    descripción queda a cargo del LLM.
+    """
+    shape = result_shape(df)
+    if shape == "empty":
+        return template("empty", language), None
+    if shape == "scalar":
+        return render_scalar(str(df.columns[0]), df.iat[0, 0], language), None
+    if shape == "row":
+        fields = "\n".join(template("value", language, column=column, value=format_value(value))
+                           for column, value in df.iloc[0].items())
+        return template("row", language, fields=fields), df
+    if shape == "table":
+        return template("table", language, rows=len(df)), df
+
+    table = df.head(TABLE_MAX_ROWS)
+    if use_llm:
+        return None, table
+    return template("truncated", language, rows=len(df), shown=len(table)), table
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import threading
+import numpy as np
+
+CACHE_DIR = "../data/cache/tjii_signals"
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+def cache_key(shot, signal, factor):
+    """Clave de contenido de una señal: hash de shot, nombre de señal y factor."""
+    raw = f"{int(shot)}|{signal}|{float(factor):.2f}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def slice_window(x, y, tstart, tstop):
+    """Recorta un par de arrays (x, y) ordenados por tiempo a la ventana [tstart, tstop]."""
+    first = np.searchsorted(x, tstart, side="left")
+    last = np.searchsorted(x, tstop, side="right")
+    return x[first:last], y[first:last]
+
+
+class SignalCache:
+    """
+    Caché en disco de señales del TJ-II ya parseadas.
+
+    Cada señal (shot, señal, factor) se guarda como un .npz comprimido con los
+    arrays x e y y la ventana temporal que cubren. Una petición con una
+    ventana más estrecha se sirve recortando la entrada guardada. Cuando el
+    tamaño total supera `max_bytes` se eliminan las entradas usadas hace más
+    tiempo (LRU según la fecha de modificación, que se actualiza en cada acierto).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npz")
+
+    def _load(self, shot, signal, factor):
+        path = self._path(cache_key(shot, signal, factor))
+        if not os.path.exists(path):
+            return None, path
+        try:
+            with np.load(path) as entry:
+                return {name: entry[name] for name in entry.files}, path
+        except FileNotFoundError:
+            return None, path
+        except Exception as e:
+            print(f"Warning: Discarding corrupt cache entry {path}: {e}")
+            os.remove(path)
+            return None, path
+
+    def window(self, shot, signal, factor="1.00"):
+        """Devuelve la ventana (tstart, tstop) guardada para la señal, o None."""
+        entry, _ = self._load(shot, signal, factor)
+        if entry is None:
+            return None
+        return float(entry["tstart"]), float(entry["tstop"])
+
+    def get(self, shot, signal, factor, tstart, tstop):
+        """Devuelve (x, y) si la ventana pedida está cubierta por la caché, o None."""
+        entry, path = self._load(shot, signal, factor)
+        if entry is None or entry["tstart"] > tstart or entry["tstop"] < tstop:
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return slice_window(entry["x"], entry["y"], tstart, tstop)
+
+    def put(self, shot, signal, factor, tstart, tstop, x, y):
+        """Guarda una señal descargada para la ventana [tstart, tstop]."""
+        path = self._path(cache_key(shot, signal, factor))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(tmp_path, x=np.asarray(x, dtype=np.float64),
+                            y=np.asarray(y, dtype=np.float64),
+                            tstart=float(tstart), tstop=float(tstop))
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def size(self):
+        """Tamaño total en bytes de las entradas guardadas."""
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(".npz") and not filename.endswith(".tmp.npz"):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def evict(self):
+        """Elimina las entradas menos usadas hasta quedar por debajo de `max_bytes`."""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Vacía la caché."""
+        for _, path, _ in self._entries():
+            os.remove(path)
@@ -0,0 +1,88 @@
+"""
+Registro de los nombres de señal de `signal_options.txt`.
+
+Se construye una sola vez: un diccionario nombre en minúsculas → nombre
+canónico para comprobar señales en O(1) sin distinguir mayúsculas, y una
+única expresión regular compilada con límites de palabra para encontrar
+señales dentro de un texto (más larga primero, para que "ECE10" no se quede
+en "ECE1"). También agrupa las señales en familias por prefijo (ECE*, BO1xx,
+CNPA*, He_667*), que es como las dibuja `plotter`.
+"""
+import re
+from functools import lru_cache
+
+from config_loader import load_signal_options
+
+SIGNAL_OPTIONS_FILE = "./config/signal_options.txt"
+
+# BO101..BO320, RX101..RX516: un array por primera cifra
+ARRAY_PATTERN = re.compile(r"^([A-Za-z]+)(\d)\d\d$")
+# ECE10, CNPA05, He_667_01, MID5P_02, Cx01_: el canal es el número final
+CHANNEL_PATTERN = re.compile(r"^(.*?[A-Za-z0-9])_?\d+_?$")
+
+def signal_family(signal):
+    """Familia de una señal: 'BO1xx' para BO101, 'ECE' para ECE7, 'He_667' para He_667_01."""
+    match = ARRAY_PATTERN.match(signal)
+    if match:
+        return f"{match.group(1)}{match.group(2)}xx"
+    match = CHANNEL_PATTERN.match(signal)
+    if match and not match.group(1).isdigit():
+        return match.group(1)
+    return signal
+
+def group_signals(signals):
+    """Agrupa señales por familia, conservando el orden de aparición."""
+    grouped_signals = {}
+    for signal in signals:
+        grouped_signals.setdefault(signal_family(signal), []).append(signal)
+    return grouped_signals
+
+
+class SignalRegistry:
+    """Conjunto de señales válidas con búsqueda en texto sin distinguir mayúsculas."""
+
+    def __init__(self, signals):
+        self.canonical_names = {signal.casefold(): signal for signal in signals}
+        self.names = frozenset(self.canonical_names.values())
+        alternatives = sorted(self.canonical_names, key=len, reverse=True)
+        # Límites de palabra Unicode: "GR" no debe encontrarse dentro de "gráfica"
+        self.pattern = re.compile(r"(?<!\w)(" + "|".join(map(re.escape, alternatives))
+                                  + r")(?!\w)", re.IGNORECASE) if alternatives else None
+
+    def __contains__(self, signal):
+        return isinstance(signal, str) and signal.casefold() in self.canonical_names
+
+    def __len__(self):
+        return len(self.names)
+
+    def canonical(self, signal):
+        """Nombre tal y como aparece en signal_options.txt, o None si no es una señal válida."""
+        return self.canonical_names.get(signal.casefold()) if isinstance(signal, str) else None
+
+    def valid(self, signals):
+        """Filtra una lista de nombres y los devuelve con su nombre canónico, sin repetir."""
+        found = []
+        for signal in signals:
+            name = self.canonical(signal)
+            if name is not None and name not in found:
+                found.append(name)
+        return found
+
+    def find(self, text):
+        """Señales mencionadas en el texto, en orden de aparición y sin repetir."""
+        if self.pattern is None:
+            return []
+        return self.valid(match.group(1) for match in self.pattern.finditer(text))
+
+    def mentions_signal(self, text):
+        """True si el texto nombra alguna señal."""
+        return self.pattern is not None and self.pattern.search(text) is not None
+
+    def families(self):
+        """Todas las señales agrupadas por familia."""
+        return group_signals(sorted(self.names))
+
+@lru_cache(maxsize=None)
+def get_registry(filename=SIGNAL_OPTIONS_FILE):
+    """Registro compartido, construido la primera vez que se pide."""
+    return SignalRegistry(load_signal_options(filename))
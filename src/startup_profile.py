@@ -0,0 +1,108 @@
+"""
+Desglose del tiempo de arranque.
+
+`StartupProfile` mide fases con nombre (`with profile.phase("imports"):`) y,
+mientras está activo, el tiempo de importación de cada módulo, al estilo de
+`python -X importtime`: tiempo propio (sólo el código del módulo) y
+acumulado (incluidos los módulos que importa). Se activa con la opción
+`--startup-profile` de `main.py`.
+"""
+import importlib.abc
+import sys
+import time
+from contextlib import contextmanager
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Envuelve el loader real y mide la ejecución del módulo."""
+
+    def __init__(self, profile, loader):
+        self.profile = profile
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.profile._enter(module.__name__)
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profile._exit(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Buscador que delega en los demás de `sys.meta_path` y cronometra los módulos que encuentran."""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(self.profile, spec.loader)
+                return spec
+        return None
+
+
+class StartupProfile:
+    """Tiempos de las fases de arranque y de las importaciones (desactivado no hace nada)."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []
+        self.imports = {}
+        self._stack = []
+        self._finder = None
+        if enabled:
+            self._finder = _ImportTimer(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def _enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, name):
+        _, started, children = self._stack.pop()
+        cumulative = time.perf_counter() - started
+        self.imports[name] = (cumulative - children, cumulative, len(self._stack))
+        if self._stack:
+            self._stack[-1][2] += cumulative
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.phases.append((name, time.perf_counter() - started))
+
+    def stop(self):
+        if self._finder is not None and self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+
+    def report(self, top=20, file=None):
+        """Imprime las fases y los módulos con mayor tiempo de importación acumulado."""
+        if not self.enabled:
+            return
+        file = file or sys.stderr
+        total = time.perf_counter() - self.start
+        print(f"Startup: {total * 1000:.0f} ms", file=file)
+        for name, elapsed in self.phases:
+            print(f"  {name:<28} {elapsed * 1000:>9.1f} ms", file=file)
+
+        top_level = sum(cumulative for _, cumulative, depth in self.imports.values() if depth == 0)
+        print(f"Imports: {len(self.imports)} modules, {top_level * 1000:.0f} ms", file=file)
+        print(f"  {'self [ms]':>10} | {'cumulative':>10} | module", file=file)
+        ranked = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (own, cumulative, depth) in ranked[:top]:
+            print(f"  {own * 1000:>10.1f} | {cumulative * 1000:>10.1f} | {'  ' * depth}{name}", file=file)
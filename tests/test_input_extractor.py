@@ -0,0 +1,67 @@
+import pytest
+
+from input_extractor import InputExtractor
+from signal_registry import SignalRegistry
+
+
+@pytest.fixture
+def extractor():
+    return InputExtractor(SignalRegistry(["ECE1", "ECE7", "Densidad2_"]))
+
+
+def test_bare_window_after_shot(extractor):
+    assert extractor.extract("plot ECE1 shot 57546 1000-1200") == {
+        "shot": 57546, "tstart": 1000.0, "tstop": 1200.0, "signals": ["ECE1"]}
+    assert extractor.extract("plot ECE1 shot 57546 1000 1200") == {
+        "shot": 57546, "tstart": 1000.0, "tstop": 1200.0, "signals": ["ECE1"]}
+
+
+@pytest.mark.parametrize("user_input", [
+    "plot ECE1 shot 57546 at 1100",
+    "plot ECE1 shot 57546 in 2024",
+    "plot ECE1 shot 57546, 57547",
+])
+def test_unexplained_number_falls_back_to_llm(extractor, user_input):
+    assert extractor.extract(user_input) is None
+    assert extractor.shot_number(user_input) is None
+
+
+@pytest.mark.parametrize("user_input, shots", [
+    ("plot ECE1 for shots 57546, 57547", [57546, 57547]),
+    ("plot ECE1 for shots 57546 and 57550", [57546, 57550]),
+    ("plot ECE1 from shot 57546 to 57550", [57546, 57547, 57548, 57549, 57550]),
+    ("señal ECE7 de las descargas 57546 a 57548", [57546, 57547, 57548]),
+    ("plot ECE1 for shots 57546-57548 and 57560", [57546, 57547, 57548, 57560]),
+])
+def test_several_shots_need_explicit_wording(extractor, user_input, shots):
+    assert extractor.extract(user_input)["shot"] == shots
+
+
+@pytest.mark.parametrize("user_input", [
+    "plot ECE1 from shot 57546 to 57600",
+    "plot ECE1 from shot 57550 to 57546",
+])
+def test_long_or_descending_ranges_fall_back_to_llm(extractor, user_input):
+    assert extractor.extract(user_input) is None
+
+
+@pytest.mark.parametrize("user_input", [
+    "Which shots in 2024 had MHD?",
+    "¿Qué descargas de 2024 tuvieron MHD?",
+    "¿Tiene MHD la descarga 57546 del 2024?",
+])
+def test_years_are_not_shots(extractor, user_input):
+    assert extractor.shot_number(user_input) is None
+
+
+def test_explicit_window(extractor):
+    result = extractor.extract("señal ECE7 del shot 57546 entre 1050 y 1250 ms")
+    assert (result["shot"], result["tstart"], result["tstop"]) == (57546, 1050.0, 1250.0)
+    result = extractor.extract("plot ECE1 shot 57546 from 1.0 to 1.2 s")
+    assert (result["tstart"], result["tstop"]) == (1000.0, 1200.0)
+
+
+def test_single_shot(extractor):
+    assert extractor.extract("plot ECE1 shot 57546") == {
+        "shot": 57546, "tstart": 0.0, "tstop": 2000.0, "signals": ["ECE1"]}
+    assert extractor.shot_number("predice la descarga 57546") == 57546
@@ -0,0 +1,23 @@
+import pytest
+
+from intent_classifier import IntentClassifier
+
+
+@pytest.mark.parametrize("user_input", ["Qué es ICX?", "¿Qué es ICX?", "  ¿ what is a magnetic island?"])
+def test_definition_questions_are_general(user_input):
+    intent, _, source = IntentClassifier(model_path=None).classify(user_input)
+    assert (intent, source) == ("GENERAL", "rules")
+
+
+@pytest.mark.parametrize("user_input", ["Which shots in 2024 had MHD?", "¿Qué descargas de 2024 tuvieron MHD?"])
+def test_mhd_results_questions_go_to_csv(user_input):
+    classifier = IntentClassifier(model_path=None)
+    assert classifier.classify(user_input, mhd_results=True) == ("CSV", 1.0, "mhd results")
+    # Sin la tabla de resultados no hay nada que consultar
+    assert classifier.classify(user_input)[0] != "CSV"
+
+
+def test_single_shot_mhd_question_is_a_prediction():
+    classifier = IntentClassifier(model_path=None)
+    assert not classifier.asks_mhd_results("¿La descarga 57547 tiene mhd?")
+    assert classifier.classify("¿La descarga 57547 tiene mhd?", mhd_results=True)[0] == "PREDICT"
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from llm_backends import LLMBackend, StubBackend
+
+
+def test_generate_many_keeps_order():
+    backend = StubBackend(latency=0.01, token_delay=0, concurrency=2)
+    prompts = ["a", "b", "c"]
+    assert backend.generate_many(prompts) == [backend.generate(prompt) for prompt in prompts]
+    backend.close()
+
+
+def test_generate_many_timeout_covers_the_whole_batch():
+    # Con un solo hueco las tres llamadas van una detrás de otra (0.9 s); el plazo es para todo el lote
+    backend = StubBackend(latency=0.3, token_delay=0, concurrency=1, timeout=0.5)
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        backend.generate_many(["a", "b", "c"])
+    assert time.perf_counter() - start < 0.8
+    backend.close()
+
+
+def test_backend_without_generate_fails_on_creation():
+    class Incomplete(LLMBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_generate_many_single_prompt_has_a_timeout():
+    backend = StubBackend(latency=0.5, token_delay=0, timeout=0.1)
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        backend.generate_many(["a"])
+    assert time.perf_counter() - start < 0.4
+    backend.close()
+
+
+def test_timeout_in_thread_bounds_generate():
+    # Como WatsonxBackend: el cliente no admite plazo y se espera en un hilo
+    backend = StubBackend(latency=0.5, token_delay=0, timeout=0.1)
+    backend.timeout_in_thread = True
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        backend.generate("a")
+    assert time.perf_counter() - start < 0.4
+
+    backend = StubBackend(latency=0.01, token_delay=0, timeout=1)
+    backend.timeout_in_thread = True
+    assert backend.generate("a") == StubBackend(latency=0).generate("a")
+    backend.close()
@@ -0,0 +1,110 @@
+import math
+import os
+
+import pytest
+
+from logbook_db import LogbookDatabase
+
+HEADER = "N_DESCARGA,FECHA,HORA,CONFIGURACION,IP_MAX,NE_MEDIA,VALIDADA\n"
+ROWS = [
+    "57540,2024/01/10,10:00,100_44_64,120.5,1,S\n",
+    "57541,2024/01/10,10:30,100_40_63,,2,N\n",
+    "57542,,11:00,,98.25,3,S\n",
+    "57543,2023/12/01,09:00,100_44_64,130,,S\n",
+    "57539,2023/11/30,17:45,101_42_64,87.75,4,\n",
+]
+APPENDED = [
+    "57544,2024/02/01,10:00,100_40_63,140.25,5,S\n",
+    "57545,,10:15,,,,N\n",
+]
+QUERIES = [
+    "SELECT COUNT(*) FROM data",
+    "SELECT COUNT(*) FROM data WHERE substr(fecha, 1, 4) = '2024'",
+    "SELECT COUNT(*) FROM data WHERE substr(fecha, 1, 7) = '2023/12'",
+    "SELECT COUNT(*) FROM data WHERE substr(fecha, 1, 10) = '2024/01/10'",
+    "SELECT COUNT(*) FROM data WHERE fecha = '2024/01/10'",
+    "SELECT COUNT(*) FROM data WHERE configuracion = '100_44_64'",
+    "SELECT COUNT(*) FROM data WHERE n_descarga = 57541",
+    "SELECT * FROM data WHERE n_descarga = 12345",
+    "SELECT MAX(n_descarga) FROM data",
+    "SELECT MIN(ip_max) FROM data",
+    "SELECT MAX(CAST(ip_max AS INTEGER)) FROM data",
+    "SELECT MIN(CAST(ne_media AS REAL)) FROM data",
+    "SELECT MAX(fecha) FROM data",
+    "SELECT MIN(fecha) FROM data",
+    "SELECT * FROM data ORDER BY n_descarga DESC LIMIT 1",
+    "SELECT fecha, configuracion FROM data ORDER BY n_descarga DESC LIMIT 1",
+    "SELECT substr(fecha, 1, 4), COUNT(*) FROM data GROUP BY substr(fecha, 1, 4)",
+    "SELECT substr(fecha, 1, 7), COUNT(*) FROM data GROUP BY substr(fecha, 1, 7)",
+    "SELECT fecha, COUNT(*) FROM data GROUP BY fecha",
+    "SELECT configuracion, COUNT(*) FROM data GROUP BY configuracion",
+]
+
+
+def normalize(df):
+    def value(v):
+        if v is None or (isinstance(v, float) and math.isnan(v)) or str(v) == "<NA>":
+            return None
+        return v.item() if hasattr(v, "item") else v
+    return list(df.columns), [tuple(value(v) for v in row) for row in df.itertuples(index=False, name=None)]
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    # Asegura que la firma (tamaño, mtime) cambia aunque el sistema de ficheros tenga poca resolución
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def logbook(tmp_path):
+    csv_file = tmp_path / "logbook.csv"
+    write(csv_file, HEADER + "".join(ROWS))
+    db = LogbookDatabase(str(csv_file), str(tmp_path / "aggregated.sqlite"), results_db=None)
+    yield db, csv_file, tmp_path
+    db.close()
+
+
+def assert_same_as_sqlite(db, csv_file, tmp_path):
+    reference = LogbookDatabase(str(csv_file), str(tmp_path / f"reference_{os.stat(csv_file).st_size}.sqlite"),
+                                results_db=None, aggregates=False)
+    try:
+        for sql_query in QUERIES:
+            assert normalize(db.query(sql_query)) == normalize(reference.query(sql_query)), sql_query
+            assert db.aggregates.answer(sql_query) is not None, sql_query
+    finally:
+        reference.close()
+
+
+def test_matches_sqlite_with_nulls(logbook):
+    assert_same_as_sqlite(*logbook)
+
+
+def test_appended_rows(logbook):
+    db, csv_file, tmp_path = logbook
+    assert_same_as_sqlite(db, csv_file, tmp_path)
+    write(csv_file, HEADER + "".join(ROWS + APPENDED))
+    assert_same_as_sqlite(db, csv_file, tmp_path)
+    assert db.appended_rows == len(APPENDED)
+    assert db.aggregates.stats()["incremental_refreshes"] == 1
+
+
+def test_rewritten_file(logbook):
+    db, csv_file, tmp_path = logbook
+    assert_same_as_sqlite(db, csv_file, tmp_path)
+    write(csv_file, HEADER + "".join(reversed(ROWS[1:] + APPENDED)))
+    assert_same_as_sqlite(db, csv_file, tmp_path)
+    assert db.aggregates.stats()["full_refreshes"] == 2
+
+
+def test_missing_trailing_newline(logbook):
+    db, csv_file, tmp_path = logbook
+    write(csv_file, HEADER + "".join(ROWS) + APPENDED[0].rstrip("\n"))
+    assert_same_as_sqlite(db, csv_file, tmp_path)
+    assert db.query("SELECT MAX(n_descarga) FROM data").iat[0, 0] == 57544
+
+    # La fila sin "\n" se vuelve a leer cuando se completa el fichero
+    write(csv_file, HEADER + "".join(ROWS + APPENDED))
+    assert_same_as_sqlite(db, csv_file, tmp_path)
+    assert db.query("SELECT COUNT(*) FROM data").iat[0, 0] == len(ROWS + APPENDED)
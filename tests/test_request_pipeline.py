@@ -0,0 +1,19 @@
+import asyncio
+import time
+
+from request_pipeline import PipelineRequest
+
+
+def test_concurrent_stages_keep_the_longest():
+    request = PipelineRequest(None, time.monotonic() + 10)
+
+    async def delayed(delay, duration):
+        await asyncio.sleep(delay)
+        await request.stage("plot", asyncio.sleep(duration), longest=True)
+
+    async def run():
+        # El gráfico corto empieza más tarde y termina el último
+        await asyncio.gather(delayed(0, 0.2), delayed(0.15, 0.1))
+
+    asyncio.run(run())
+    assert request.stages["plot"] >= 0.2
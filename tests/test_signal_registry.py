@@ -0,0 +1,23 @@
+import pytest
+
+from signal_registry import SignalRegistry
+
+
+@pytest.fixture
+def registry():
+    return SignalRegistry(["GR", "TFI", "ECE1", "ECE10", "Densidad2_"])
+
+
+@pytest.mark.parametrize("text, signals", [
+    ("Dibuja el gráfico de TFI", ["TFI"]),
+    ("Muéstrame la gráfica de TFI de la descarga 57546", ["TFI"]),
+    ("grá TFI", ["TFI"]),
+    ("Representa GR y ECE10 en una gráfica", ["GR", "ECE10"]),
+    ("señal densidad2_ y ece1", ["Densidad2_", "ECE1"]),
+])
+def test_find_only_whole_signal_names(registry, text, signals):
+    assert registry.find(text) == signals
+
+
+def test_accented_words_are_not_signals(registry):
+    assert not registry.mentions_signal("¿Qué gráficas hay?")